@@ -57,8 +57,8 @@ setup(
     install_requires=[  # Make sure to keep in sync with poetry requirements.
         "click>=8,<9",
         "mypy>=0.782",
-        "toml>=0.10.2,<1",
-        "types-toml>=0.10.4,<1",
+        "tomli>=1.2.0,<3; python_version < '3.11'",
     ],
+    extras_require={"re2": ["google-re2>=1.0,<2"]},
     python_requires=">=3.7",
 )
@@ -1,36 +1,52 @@
+from functools import lru_cache
+import io
+import os
 from os import path
 from pathlib import Path
 import pprint
 from subprocess import CompletedProcess
 import sys
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 import click
-import toml
 
 from .config_generation import (
     AUTOGENERATED_LINE_PREFIX,
-    make_1st_party_module_rule_block,
+    UNUSED_IGNORES_LINE_FALSE,
+    UNUSED_IGNORES_LINE_TRUE,
     make_ignore_missing_imports_block,
     make_lax_baseline_mypy_config,
     make_strict_baseline_mypy_config,
-    make_unused_ignores_config_line,
+    write_1st_party_module_rule_blocks,
 )
 from .error_tracker import (
+    all_errors_have_known_settings,
+    bucket_errors_by_code,
     find_unused_ignores,
     get_1st_party_modules_and_suppressions,
     get_3rd_party_modules_missing_type_hints,
 )
 from .mypy_runner import (
+    CACHE_DIR_ENV_VAR,
+    DEFAULT_CACHE_DIR,
     MypyError,
+    any_mypy_errors,
     get_mypy_errors_for_run_with_config,
     get_mypy_errors_from_completed_process,
     run_mypy_with_config,
-    run_mypy_with_config_file,
+    run_mypy_with_config_async,
+    run_mypy_with_existing_config_file,
+    set_cache_dir,
+    set_reuse_previous_runs,
 )
 from .own_config import TypingCopilotConfig, find_pyproject_toml
-from .verbosity import enable_verbose_mode, log_if_verbose
-from . import __package_name__, __version__
+from . import __package_name__, __version__, verbosity
+
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
 
 
 def _make_strictest_mypy_config_components_from_errors(
@@ -40,12 +56,17 @@ def _make_strictest_mypy_config_components_from_errors(
     describe_constructed_config: bool = True,
 ) -> Tuple[str, str, str, str]:
     final_config_global = make_strict_baseline_mypy_config(own_config)
-    final_config_unused_ignores = make_unused_ignores_config_line(True)
+    final_config_unused_ignores = UNUSED_IGNORES_LINE_TRUE
     final_config_first_party_modules = ""
     final_config_third_party_modules = ""
 
-    imported_modules_missing_type_hints = get_3rd_party_modules_missing_type_hints(strict_errors)
+    strict_errors_by_code = bucket_errors_by_code(strict_errors)
+
+    imported_modules_missing_type_hints = get_3rd_party_modules_missing_type_hints(
+        strict_errors_by_code
+    )
     if imported_modules_missing_type_hints:
+        sorted_modules_missing_type_hints = sorted(imported_modules_missing_type_hints)
         click.echo(
             "> Mypy was unable to find type hints for some 3rd party modules, configuring mypy to "
             "ignore them."
@@ -53,14 +74,16 @@ def _make_strictest_mypy_config_components_from_errors(
         click.echo(
             "    More info: https://mypy.readthedocs.io/en/stable/running_mypy.html#missing-imports"
         )
-        click.echo(f"    Affected modules: {sorted(list(imported_modules_missing_type_hints))}\n")
+        click.echo(f"    Affected modules: {sorted_modules_missing_type_hints}\n")
 
-        final_config_third_party_modules = "# Third-party module rule relaxations" + "".join(
+        third_party_config_parts = ["# Third-party module rule relaxations"]
+        third_party_config_parts.extend(
             make_ignore_missing_imports_block(module_name)
-            for module_name in sorted(imported_modules_missing_type_hints)
+            for module_name in sorted_modules_missing_type_hints
         )
+        final_config_third_party_modules = "".join(third_party_config_parts)
 
-    first_party_suppressions = get_1st_party_modules_and_suppressions(strict_errors)
+    first_party_suppressions = get_1st_party_modules_and_suppressions(strict_errors_by_code)
     if first_party_suppressions:
         total_rule_module_suppressions = sum(
             len(value) for value in first_party_suppressions.values()
@@ -70,10 +93,12 @@ def _make_strictest_mypy_config_components_from_errors(
                 f"> Constructed {total_rule_module_suppressions} mypy error suppression rules "
                 f"across {len(first_party_suppressions)} modules.\n"
             )
-        final_config_first_party_modules = "# First party per-module rule relaxations" + "".join(
-            make_1st_party_module_rule_block(module_name, first_party_suppressions[module_name])
-            for module_name in sorted(first_party_suppressions.keys())
+        first_party_config_buffer = io.StringIO()
+        first_party_config_buffer.write("# First party per-module rule relaxations")
+        write_1st_party_module_rule_blocks(
+            first_party_config_buffer, sorted(first_party_suppressions.items())
         )
+        final_config_first_party_modules = first_party_config_buffer.getvalue()
 
     return (
         final_config_global,
@@ -89,10 +114,13 @@ def _generate_final_mypy_config_from_components(
     final_config_first_party_modules: str,
     final_config_third_party_modules: str,
 ) -> str:
-    return "\n\n".join(
+    return "".join(
         [
-            final_config_global + final_config_unused_ignores,
+            final_config_global,
+            final_config_unused_ignores,
+            "\n\n",
             final_config_first_party_modules,
+            "\n\n",
             final_config_third_party_modules,
         ]
     )
@@ -118,27 +146,44 @@ def _generate_final_mypy_config_with_unused_ignore_suppression(
     )
     return _generate_final_mypy_config_from_components(
         final_config_components[0],
-        make_unused_ignores_config_line(False),
+        UNUSED_IGNORES_LINE_FALSE,
         final_config_components[2],
         final_config_components[3],
     )
 
 
+def _make_full_strict_mypy_config(own_config: TypingCopilotConfig) -> str:
+    return make_strict_baseline_mypy_config(own_config) + UNUSED_IGNORES_LINE_FALSE
+
+
 def _get_strict_run_mypy_errors(own_config: TypingCopilotConfig) -> List[MypyError]:
-    return get_mypy_errors_for_run_with_config(
-        make_strict_baseline_mypy_config(own_config) + make_unused_ignores_config_line(False)
-    )
+    return get_mypy_errors_for_run_with_config(_make_full_strict_mypy_config(own_config))
 
 
-def _get_unused_ignore_errors_from_validation_run(mypy_config: str) -> List[MypyError]:
+def _get_unused_ignore_errors_from_validation_run(
+    mypy_config: str, *, lax_baseline_mypy_config: Optional[str] = None
+) -> List[MypyError]:
     completed_process = run_mypy_with_config(mypy_config)
     validation_run_errors = get_mypy_errors_from_completed_process(completed_process)
     unused_ignore_errors = find_unused_ignores(validation_run_errors)
-    other_errors = set(validation_run_errors) - set(unused_ignore_errors)
+    if unused_ignore_errors:
+        unused_ignore_error_set = frozenset(unused_ignore_errors)
+        other_errors = [
+            error for error in validation_run_errors if error not in unused_ignore_error_set
+        ]
+    else:
+        other_errors = validation_run_errors
 
     if other_errors:
+        if lax_baseline_mypy_config is not None:
+            # The lax baseline run was skipped, so first check whether these errors are ones
+            # that no configuration could suppress, and tell the user if so.
+            _exit_if_lax_baseline_run_has_errors(
+                run_mypy_with_config(lax_baseline_mypy_config), lax_baseline_mypy_config
+            )
+
         click.echo("Validation failed due to unexpected error(s):")
-        click.echo(pprint.pformat(list(other_errors)))
+        click.echo(pprint.pformat(other_errors))
 
         raise AssertionError(
             f"Validation failed: mypy reported {len(other_errors)} unexpected error(s). "
@@ -179,6 +224,33 @@ def _work_around_mypy_strict_optional_bug(
     return completed_process, workaround_lax_config
 
 
+def _exit_if_lax_baseline_run_has_errors(
+    completed_process: CompletedProcess, full_lax_config: str
+) -> None:
+    completed_process, full_lax_config = _work_around_mypy_strict_optional_bug(
+        completed_process, full_lax_config
+    )
+    if any_mypy_errors(completed_process):
+        click.echo("Mypy found errors during our baseline run. Executed mypy with config:\n")
+        click.echo(full_lax_config)
+        click.echo("Mypy output:\n")
+        click.echo(completed_process.stdout)
+        click.echo(
+            "Since these errors happen at mypy's most permissive settings, they cannot "
+            "be suppressed. Please resolve them, then run this command again."
+        )
+        sys.exit(0)
+
+
+def _write_mypy_ini(mypy_config: str) -> None:
+    # Write the whole file in one go, to a temporary file that is then moved into place.
+    # This way, an interrupted write can never leave behind a truncated mypy.ini file.
+    temporary_path = "mypy.ini.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(mypy_config.encode("utf-8"))
+    os.replace(temporary_path, "mypy.ini")
+
+
 def _get_own_config() -> TypingCopilotConfig:
     search_path = Path.cwd().resolve()
     pyproject_toml_config = _fetch_config_from_pyproject_toml(search_path)
@@ -189,12 +261,15 @@ def _get_own_config() -> TypingCopilotConfig:
     return TypingCopilotConfig.empty()
 
 
+# Finding and parsing the pyproject.toml file requires walking the filesystem, so we only do it
+# once per search path. Errors exit the process, so only successful lookups are ever cached.
+@lru_cache(maxsize=1)
 def _fetch_config_from_pyproject_toml(search_path: Path) -> Optional[TypingCopilotConfig]:
     pyproject_toml_path = find_pyproject_toml(search_path)
     if pyproject_toml_path is not None:
         try:
-            with open(pyproject_toml_path) as f:
-                return TypingCopilotConfig.from_toml(toml.load(f))
+            with open(pyproject_toml_path, "rb") as f:
+                return TypingCopilotConfig.from_toml(tomllib.load(f))
         except OSError as e:
             click.secho(
                 f"Failed to open pyproject.toml file at path {pyproject_toml_path} "
@@ -202,7 +277,7 @@ def _fetch_config_from_pyproject_toml(search_path: Path) -> Optional[TypingCopil
                 fg="red",
             )
             sys.exit(1)
-        except toml.TomlDecodeError:
+        except tomllib.TOMLDecodeError:
             click.secho(
                 f"Failed to read config from pyproject.toml file at path {pyproject_toml_path} "
                 f"since it does not appear to be valid TOML. Please check the pyproject.toml "
@@ -219,8 +294,8 @@ def _fetch_config_from_pyproject_toml(search_path: Path) -> Optional[TypingCopil
 def cli(verbose: bool, version: bool) -> None:
     click.echo(f"typing_copilot v{__version__}\n")
     if verbose:
-        enable_verbose_mode()
-        log_if_verbose("Verbose mode enabled.")
+        verbosity.enable_verbose_mode()
+        verbosity.log_if_verbose("Verbose mode enabled.")
 
 
 @cli.command()
@@ -228,11 +303,57 @@ def cli(verbose: bool, version: bool) -> None:
 @click.option(
     "--overwrite", is_flag=True, default=False, help="Overwrite existing mypy.ini, if any"
 )
-def init(verbose: bool, overwrite: bool) -> None:
+@click.option(
+    "--validate/--no-validate",
+    default=False,
+    help=(
+        "Run mypy one more time to validate the generated configuration, and to check whether "
+        "'warn_unused_ignores' can be enabled. Off by default, in which case validation only "
+        "runs if some errors of the strict mypy run could not be mapped to the mypy settings "
+        "that cause them by explicit rules."
+    ),
+)
+@click.option(
+    "--parallel/--no-parallel",
+    default=True,
+    help=(
+        "Run the baseline and strict mypy checks concurrently. On by default; turn it off "
+        "to reduce peak CPU and memory use, at the cost of a slower run. Has no effect with "
+        "'--validate', which skips the baseline check unless validation fails."
+    ),
+)
+@click.option(
+    "--cache-dir",
+    envvar=CACHE_DIR_ENV_VAR,
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help=(
+        "Directory in which to keep mypy's incremental cache and the results of previous mypy "
+        f"runs. Can also be set with the {CACHE_DIR_ENV_VAR} environment variable."
+    ),
+)
+@click.option(
+    "--reuse-previous-runs/--no-reuse-previous-runs",
+    default=True,
+    help=(
+        "Reuse the results of mypy runs from previous invocations, if neither the mypy config "
+        "nor any source code that mypy checks appears to have changed since. On by default."
+    ),
+)
+def init(
+    verbose: bool,
+    overwrite: bool,
+    validate: bool,
+    parallel: bool,
+    cache_dir: str,
+    reuse_previous_runs: bool,
+) -> None:
     """Generate an initial mypy.ini file for your project."""
     if verbose:
-        enable_verbose_mode()
-        log_if_verbose("Verbose mode enabled.")
+        verbosity.enable_verbose_mode()
+        verbosity.log_if_verbose("Verbose mode enabled.")
+    set_cache_dir(cache_dir)
+    set_reuse_previous_runs(reuse_previous_runs)
 
     if path.exists("mypy.ini"):
         if overwrite:
@@ -249,37 +370,46 @@ def init(verbose: bool, overwrite: bool) -> None:
 
     own_config = _get_own_config()
 
-    click.echo("Running mypy once with laxest settings to establish a baseline. Please wait...\n")
+    full_lax_config = make_lax_baseline_mypy_config(own_config) + UNUSED_IGNORES_LINE_FALSE
 
-    full_lax_config = make_lax_baseline_mypy_config(own_config) + make_unused_ignores_config_line(
-        False
-    )
-    completed_process = run_mypy_with_config(full_lax_config)
-    completed_process, full_lax_config = _work_around_mypy_strict_optional_bug(
-        completed_process, full_lax_config
-    )
-    errors = get_mypy_errors_from_completed_process(completed_process)
-    if errors:
-        click.echo("Mypy found errors during our baseline run. Executed mypy with config:\n")
-        click.echo(full_lax_config)
-        click.echo("Mypy output:\n")
-        click.echo(completed_process.stdout)
+    if validate:
+        # The lax baseline run only serves to detect errors that no configuration can suppress.
+        # The validation run would detect those as well, so we skip the lax run entirely and
+        # only fall back to it if validation fails, to explain why it failed.
+        click.echo("Collecting mypy errors from strictest check configuration. Please wait...\n")
+        lax_run = None
+    else:
         click.echo(
-            "Since these errors happen at mypy's most permissive settings, they cannot "
-            "be suppressed. Please resolve them, then run this command again."
+            "Running mypy with laxest settings to establish a baseline, and collecting mypy "
+            "errors from strictest check configuration. Please wait...\n"
         )
-        sys.exit(0)
 
-    click.echo("Collecting mypy errors from strictest check configuration. Please wait...\n")
-    strict_errors = _get_strict_run_mypy_errors(own_config)
-    if not strict_errors:
-        with open("mypy.ini", "w") as f:
-            f.write(make_strict_baseline_mypy_config(own_config))
-        click.echo(
-            "Strict run completed, no errors found. Updated your mypy.ini file with the strictest "
-            "settings supported by typing_copilot. Congratulations and happy type-safe coding!"
-        )
-        sys.exit(0)
+        # The lax baseline and strict runs are independent of each other, so unless asked not to,
+        # we run the lax one in the background while the strict one runs. If the strict run finds
+        # no errors, then neither would the lax one, so in that case the lax run is either stopped
+        # without waiting for its result, or never started at all.
+        lax_run = run_mypy_with_config_async(full_lax_config) if parallel else None
+    try:
+        strict_completed_process = run_mypy_with_config(_make_full_strict_mypy_config(own_config))
+        strict_errors = get_mypy_errors_from_completed_process(strict_completed_process)
+        if not strict_errors:
+            _write_mypy_ini(make_strict_baseline_mypy_config(own_config))
+            click.echo(
+                "Strict run completed, no errors found. Updated your mypy.ini file with the "
+                "strictest settings supported by typing_copilot. Congratulations and happy "
+                "type-safe coding!"
+            )
+            sys.exit(0)
+
+        if lax_run is not None:
+            _exit_if_lax_baseline_run_has_errors(lax_run.result(), full_lax_config)
+        elif not validate:
+            _exit_if_lax_baseline_run_has_errors(
+                run_mypy_with_config(full_lax_config), full_lax_config
+            )
+    finally:
+        if lax_run is not None:
+            lax_run.cancel()
 
     click.echo(
         f"Strict run completed and uncovered {len(strict_errors)} mypy errors. Building "
@@ -289,37 +419,73 @@ def init(verbose: bool, overwrite: bool) -> None:
     final_config_components = _make_strictest_mypy_config_components_from_errors(
         own_config, strict_errors
     )
+
+    # Skipping validation is only safe if each strict run error is known to go away with the
+    # setting that suppresses it. Otherwise, the config must be validated even if not requested.
+    if not validate and all_errors_have_known_settings(strict_errors):
+        # Without the validation run, we cannot tell whether the project has any unnecessary
+        # "type: ignore" comments, so we conservatively leave "warn_unused_ignores" disabled.
+        final_config = _generate_final_mypy_config_from_components(
+            final_config_components[0],
+            UNUSED_IGNORES_LINE_FALSE,
+            final_config_components[2],
+            final_config_components[3],
+        )
+        _write_mypy_ini(final_config)
+
+        config_file_length = final_config.count("\n") + 1
+        click.echo(
+            f"Config generated ({config_file_length} lines) and validation skipped. "
+            f"Your mypy.ini file has been updated. To also validate the new configuration and "
+            f"check whether 'warn_unused_ignores' can be enabled, re-run this command with "
+            f"'--validate' or run 'typing_copilot tighten'. Happy type-safe coding!"
+        )
+        sys.exit(0)
+
+    if not validate:
+        click.echo(
+            "Some mypy errors could only be heuristically matched to the settings that suppress "
+            "them, so the generated configuration needs to be validated.\n"
+        )
+
     final_config = _generate_final_mypy_config_from_components(*final_config_components)
 
-    config_file_length = len(final_config.split("\n"))
+    config_file_length = final_config.count("\n") + 1
     click.echo(
         f"Config generated ({config_file_length} lines). Verifying the last few mypy settings "
         f"and validating that the new configuration does not produce mypy errors. Please wait...\n"
     )
 
-    unused_ignore_errors = _get_unused_ignore_errors_from_validation_run(final_config)
+    # Without '--validate', the lax baseline run already happened and found no errors.
+    unused_ignore_errors = _get_unused_ignore_errors_from_validation_run(
+        final_config, lax_baseline_mypy_config=full_lax_config if validate else None
+    )
     if unused_ignore_errors:
         final_config = _generate_final_mypy_config_with_unused_ignore_suppression(
             final_config_components, unused_ignore_errors
         )
 
-    with open("mypy.ini", "w") as f:
-        f.write(final_config)
+    _write_mypy_ini(final_config)
     click.echo("Validation complete. Your mypy.ini file has been updated. Happy type-safe coding!")
     sys.exit(0)
 
 
-def _are_mypy_configs_equal(mypy_config_a: str, mypy_config_b: str) -> bool:
-    lines_in_a = mypy_config_a.strip().split("\n")
-    lines_in_b = mypy_config_b.strip().split("\n")
+def _iter_meaningful_mypy_config_lines(mypy_config: str) -> Iterator[str]:
+    for line in mypy_config.splitlines():
+        stripped_line = line.strip()
+        if stripped_line and not stripped_line.startswith("#"):
+            # Leading whitespace is meaningful: it marks a continuation of the previous line.
+            yield line.rstrip()
+
 
-    nonempty_lines_in_a_minus_comments = [
-        line for line in lines_in_a if line and not line.lstrip().startswith("#")
-    ]
-    nonempty_lines_in_b_minus_comments = [
-        line for line in lines_in_b if line and not line.lstrip().startswith("#")
-    ]
-    return nonempty_lines_in_a_minus_comments == nonempty_lines_in_b_minus_comments
+@lru_cache(maxsize=8)
+def _normalize_mypy_config(mypy_config: str) -> Tuple[str, ...]:
+    return tuple(_iter_meaningful_mypy_config_lines(mypy_config))
+
+
+def _are_mypy_configs_equal(mypy_config_a: str, mypy_config_b: str) -> bool:
+    # Each config is only normalized once, no matter how many other configs it is compared with.
+    return _normalize_mypy_config(mypy_config_a) == _normalize_mypy_config(mypy_config_b)
 
 
 @cli.command()
@@ -333,23 +499,41 @@ def _are_mypy_configs_equal(mypy_config_a: str, mypy_config_b: str) -> bool:
         "instead of overwriting the mypy.ini file. Intended for use in CI environments."
     ),
 )
-def tighten(verbose: bool, error_if_can_tighten: bool) -> None:
+@click.option(
+    "--cache-dir",
+    envvar=CACHE_DIR_ENV_VAR,
+    default=DEFAULT_CACHE_DIR,
+    show_default=True,
+    help=(
+        "Directory in which to keep mypy's incremental cache and the results of previous mypy "
+        f"runs. Can also be set with the {CACHE_DIR_ENV_VAR} environment variable."
+    ),
+)
+@click.option(
+    "--reuse-previous-runs/--no-reuse-previous-runs",
+    default=True,
+    help=(
+        "Reuse the results of mypy runs from previous invocations, if neither the mypy config "
+        "nor any source code that mypy checks appears to have changed since. On by default."
+    ),
+)
+def tighten(
+    verbose: bool, error_if_can_tighten: bool, cache_dir: str, reuse_previous_runs: bool
+) -> None:
     """Attempt to tighten your project's existing mypy.ini file."""
     if verbose:
-        enable_verbose_mode()
-        log_if_verbose("Verbose mode enabled.")
+        verbosity.enable_verbose_mode()
+        verbosity.log_if_verbose("Verbose mode enabled.")
+    set_cache_dir(cache_dir)
+    set_reuse_previous_runs(reuse_previous_runs)
 
     # Ensure we have a valid mypy.ini file that was autogenerated by us.
     # This command does not support tigtening arbitrary mypy.ini files.
     current_config = ""
     try:
         with open("mypy.ini", "r") as mypy_config_file:
-            current_config = mypy_config_file.read()
-            split_outputs = current_config.split("\n", 1)
-            first_non_empty_line = split_outputs[0]
-            while first_non_empty_line == "" and len(split_outputs) > 1:
-                split_outputs = split_outputs[1].split("\n", 1)
-                first_non_empty_line = split_outputs[0]
+            # Only read as far as the first non-empty line until we know the file is ours.
+            first_non_empty_line = next((line for line in mypy_config_file if line != "\n"), "")
 
             if not first_non_empty_line.startswith(AUTOGENERATED_LINE_PREFIX):
                 click.echo(
@@ -357,6 +541,10 @@ def tighten(verbose: bool, error_if_can_tighten: bool) -> None:
                     f"generated by {__package_name__} and is therefore unsupported."
                 )
                 sys.exit(1)
+
+            # Blank lines are irrelevant when comparing configs, so there's no need to keep
+            # the ones that preceded the first non-empty line.
+            current_config = first_non_empty_line + mypy_config_file.read()
     except FileNotFoundError:
         click.echo("Cannot tighten mypy config: no mypy.ini was found in the current directory.")
         sys.exit(1)
@@ -365,9 +553,10 @@ def tighten(verbose: bool, error_if_can_tighten: bool) -> None:
 
     # By this point, we know a mypy.ini file exists and is a product of this program.
     # Next, ensure that mypy passes with no errors with the current mypy.ini config.
-    completed_process = run_mypy_with_config_file("mypy.ini")
-    errors = get_mypy_errors_from_completed_process(completed_process)
-    if errors:
+    # The run is memoized like all our other runs: if neither the project nor mypy.ini
+    # have changed since a previous run, we reuse that run's output instead of re-checking.
+    completed_process = run_mypy_with_existing_config_file("mypy.ini", current_config)
+    if any_mypy_errors(completed_process):
         click.echo(
             "Cannot tighten mypy config: mypy found errors with the current mypy.ini config. "
             "Please fix these errors before attempting to find a tighter configuration:\n"
@@ -415,13 +604,12 @@ def tighten(verbose: bool, error_if_can_tighten: bool) -> None:
         click.echo(final_config)
         sys.exit(1)
 
-    config_file_length = len(final_config.split("\n"))
+    config_file_length = final_config.count("\n") + 1
     click.echo(
         f"Found a tighter mypy configuration ({config_file_length} lines), "
         f"updating your mypy.ini file."
     )
-    with open("mypy.ini", "w") as f:
-        f.write(final_config)
+    _write_mypy_ini(final_config)
     click.echo("Your mypy.ini file has been updated. Happy type-safe coding!")
     sys.exit(0)
 
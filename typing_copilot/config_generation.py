@@ -1,4 +1,5 @@
-from typing import Any, Dict, List
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, TextIO, Tuple
 
 from .error_tracker import MypyErrorSetting
 from .own_config import TypingCopilotConfig
@@ -20,6 +21,7 @@ def _make_mypy_config(mypy_global_config_values: Dict[str, Any]) -> str:
     return "\n".join(config_lines) + "\n"
 
 
+@lru_cache(maxsize=None)
 def make_strict_baseline_mypy_config(own_config: TypingCopilotConfig) -> str:
     default_values: Dict[str, Any] = {
         "no_implicit_optional": True,
@@ -40,6 +42,7 @@ def make_strict_baseline_mypy_config(own_config: TypingCopilotConfig) -> str:
     return _make_mypy_config(config_values)
 
 
+@lru_cache(maxsize=None)
 def make_lax_baseline_mypy_config(own_config: TypingCopilotConfig) -> str:
     default_values: Dict[str, Any] = {
         "no_implicit_optional": False,
@@ -65,6 +68,11 @@ def make_unused_ignores_config_line(unused_ignores_setting: bool) -> str:
     return f"warn_unused_ignores = {unused_ignores_setting}\n"
 
 
+# There are only two possible "warn_unused_ignores" lines, so we build both just once.
+UNUSED_IGNORES_LINE_TRUE = make_unused_ignores_config_line(True)
+UNUSED_IGNORES_LINE_FALSE = make_unused_ignores_config_line(False)
+
+
 def make_ignore_missing_imports_block(module_name: str) -> str:
     validate_module_name(module_name)
 
@@ -74,10 +82,14 @@ ignore_missing_imports = True
 """
 
 
-def make_1st_party_module_rule_block(module_name: str, rules: List[MypyErrorSetting]) -> str:
-    validate_module_name(module_name)
-
-    section_header = f"\n[mypy-{module_name}.*]\n"
-    rule_lines = [f"{rule_name} = {value}" for (rule_name, value) in rules]
+def write_1st_party_module_rule_blocks(
+    buffer: TextIO, modules_and_rules: Iterable[Tuple[str, List[MypyErrorSetting]]]
+) -> None:
+    # Write all the per-module blocks into one shared buffer, instead of building a separate
+    # string per module and joining them afterward. Large projects may have hundreds of them.
+    for module_name, rules in modules_and_rules:
+        validate_module_name(module_name)
 
-    return section_header + "\n".join(rule_lines) + "\n"
+        buffer.write(f"\n[mypy-{module_name}.*]\n")
+        for rule_name, value in rules:
+            buffer.write(f"{rule_name} = {value}\n")
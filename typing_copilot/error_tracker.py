@@ -1,24 +1,57 @@
-import importlib
+from collections import defaultdict
+from functools import lru_cache
 import os
-import pkgutil
 import re
-from typing import AbstractSet, Dict, FrozenSet, List, Optional, Set, Tuple
+from types import ModuleType
+from typing import (
+    AbstractSet,
+    DefaultDict,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import click
 
+from .module_cache import (
+    get_package_fingerprint,
+    load_child_module_names,
+    save_child_module_names,
+    write_child_modules_caches,
+)
 from .mypy_runner import MypyError
 from .validation import validate_module_name
 
 
-_module_missing_type_hint_pattern = re.compile(
+def _get_import_error_pattern_engine() -> ModuleType:
+    # The import error patterns only use features supported by RE2, so if the optional
+    # "google-re2" package is installed, we prefer its linear-time matching engine over
+    # the standard library's one. All other patterns use the standard library's engine.
+    try:
+        import re2
+    except ImportError:
+        return re
+
+    return re2
+
+
+_import_error_pattern_engine = _get_import_error_pattern_engine()
+_module_missing_type_hint_pattern = _import_error_pattern_engine.compile(
     r"error: Skipping analyzing [\"']([a-zA-Z0-9_\.]+)[\"']: "
     r"found module but no type hints or library stubs"
 )
-_module_missing_implementation_or_library_stub_pattern = re.compile(
+_module_missing_implementation_or_library_stub_pattern = _import_error_pattern_engine.compile(
     r"error: Cannot find implementation or library stub "
     r"for module named [\"']([a-zA-Z0-9_\.]+)[\"']"
 )
 
+_known_python_extensions = (".py", ".pyo", ".pyx", ".pyc")
+
 MypyErrorSetting = Tuple[str, bool]
 
 _warn_unused_ignores_error_setting: MypyErrorSetting = ("warn_unused_ignores", False)
@@ -57,43 +90,46 @@ _settings_that_require_other_settings: Dict[MypyErrorSetting, FrozenSet[MypyErro
 def _find_minimum_covering_modules(module_names: AbstractSet[str]) -> FrozenSet[str]:
     """Given a set of modules, return the minimum set of ancestor modules of all others."""
     # Walk the list of modules in sorted order, exploiting the fact that "foo" always sorts
-    # lexicographically before "foo.<anything>"
-    sorted_module_names = sorted(module_names)
-
-    module_prefixes: Set[str] = set()
-    for module_name in sorted_module_names:
-        module_path = module_name.split(".")
-
-        covered = False
-        for num_components in range(1, len(module_path)):
-            ancestor_module_name = ".".join(module_path[:num_components])
-            if ancestor_module_name in module_prefixes:
-                # Already covered!
-                covered = True
-                break
-
-        if not covered:
-            module_prefixes.add(module_name)
+    # lexicographically before "foo.<anything>", and that all "foo.<anything>" modules sort
+    # immediately after "foo" since "." sorts before all other valid module name characters.
+    # Therefore, the only module that could cover the current module is the last one we kept.
+    module_prefixes: List[str] = []
+    last_covering_prefix = ""
+    for module_name in sorted(module_names):
+        if module_prefixes and (
+            module_name == module_prefixes[-1] or module_name.startswith(last_covering_prefix)
+        ):
+            # Already covered!
+            continue
+
+        module_prefixes.append(module_name)
+        last_covering_prefix = module_name + "."
 
     return frozenset(module_prefixes)
 
 
 def _get_error_setting_for_error(error: MypyError) -> MypyErrorSetting:
-    possible_error_settings = _code_and_message_to_error_setting.get(error.error_code, None)
+    return _get_error_setting_for_code_and_message(error.error_code, error.message)
+
+
+# Many errors share the exact same message, e.g. "Function is missing a type annotation".
+@lru_cache(maxsize=4096)
+def _get_error_setting_for_code_and_message(error_code: str, message: str) -> MypyErrorSetting:
+    possible_error_settings = _code_and_message_to_error_setting.get(error_code, None)
     if possible_error_settings is None:
         return _remaining_error_setting
 
     error_setting: Optional[MypyErrorSetting] = None
     for error_message_pattern, possible_error_setting in possible_error_settings.items():
-        if error_message_pattern in error.message:
+        if error_message_pattern in message:
             error_setting = possible_error_setting
             break
 
     if error_setting is None:
         raise AssertionError(
             f"Failed to deduce a matching error setting for an error with recognized "
-            f"error code {error.error_code}: {error}. This is a bug, the error matching rules "
-            f"within typing_copilot will need to be updated."
+            f"error code {error_code} and message {message}. This is a bug, the error matching "
+            f"rules within typing_copilot will need to be updated."
         )
 
     return error_setting
@@ -112,16 +148,19 @@ def _get_module_for_error(error: MypyError) -> str:
     #         f"mypy error: {error}"
     #     )
 
-    error_in_file = error.file_path
-    known_python_extensions = {".py", ".pyo", ".pyx", ".pyc"}
-    for python_extension in known_python_extensions:
-        if error_in_file.endswith(python_extension):
-            error_in_file = error_in_file[: -len(python_extension)]
+    return _get_module_for_file_path(error.file_path)
+
+
+# Many errors usually share the same file, and the module is determined by the file path alone.
+@lru_cache(maxsize=8192)
+def _get_module_for_file_path(file_path: str) -> str:
+    error_in_file = file_path
+    if error_in_file.endswith(_known_python_extensions):
+        error_in_file = error_in_file[: error_in_file.rfind(".")]
 
     if "." in error_in_file:
         raise AssertionError(
-            f"Module name-finding heuristic failed due to unexpected '.' in file {error.file_path} "
-            f"for mypy error: {error}"
+            f"Module name-finding heuristic failed due to unexpected '.' in file {file_path}"
         )
 
     # Errors appearing in an "__init__.py" appear in the module given by the path one step before,
@@ -136,67 +175,95 @@ def _get_module_for_error(error: MypyError) -> str:
     return module_name
 
 
-def _get_child_module_names_for_module(module_name: str) -> Set[str]:
+# Enumerating a module's children requires importing it and walking its directory on disk,
+# so we do it at most once per module, no matter how many times the same parent comes up.
+@lru_cache(maxsize=None)
+def _get_child_module_names_for_module(module_name: str) -> FrozenSet[str]:
+    # Imported here rather than at the top of the file, since most invocations never get here
+    # and there is no need to slow down the startup of every invocation with these imports.
+    import importlib
+    import pkgutil
+
     module = importlib.import_module(module_name)
+    module_path = list(module.__path__)
+
+    # The child modules are also cached on disk, so they can be reused by later runs
+    # as long as none of the package's directories have changed.
+    package_fingerprint = get_package_fingerprint(module_path)
+    cached_result = load_child_module_names(module_name, package_fingerprint)
+    if cached_result is not None:
+        return cached_result
 
     result: Set[str] = set()
-    module_path = module.__path__
     for module_info in pkgutil.walk_packages(module_path, module_name + "."):
         result.add(module_info.name)
 
-    return result
-
+    # Walking the packages imports them, which may create "__pycache__" directories and thereby
+    # change the package's fingerprint. Fingerprint it again so that the next run can match it.
+    frozen_result = frozenset(result)
+    save_child_module_names(module_name, get_package_fingerprint(module_path), frozen_result)
+    return frozen_result
 
-def _consider_replacing_child_modules_with_parent(module_names: AbstractSet[str]) -> FrozenSet[str]:
-    """If all child modules of a parent module X are present, replace them all with X itself."""
-    # This is technically not exactly equivalent, since the parent module X includes all code
-    # present in the __init__.py of the module, as well as all child modules. However, without this
-    # transformation, the generated mypy config files are likely going to be absolutely massive!
-    # Additionally, __init__.py files tend to be relatively small, so the risk of hiding
-    # unexpected additional errors with this over-broad suppression is relatively small.
-    # If we ever want to fix this "for good", we could just check the contents of the __init__.py
-    # and only apply this transformation if the file is empty.
-    original_module_names = frozenset(module_names)
 
+def _group_modules_by_parent(
+    module_names: Iterable[str],
+) -> Tuple[Set[str], DefaultDict[str, Set[str]]]:
     parentless_module_names: Set[str] = set()
-    module_name_to_parent: Dict[str, str] = {}
+    seen_child_modules_for_parent: DefaultDict[str, Set[str]] = defaultdict(set)
 
     for module_name in module_names:
         if "." in module_name:
             parent_module, _ = module_name.rsplit(".", 1)
-            module_name_to_parent[module_name] = parent_module
+            seen_child_modules_for_parent[parent_module].add(module_name)
         else:
             parentless_module_names.add(module_name)
 
-    # For any parent_name, if we see all its child modules (i.e. its set becomes empty),
-    # we can replace all the child module names with the name of the parent module.
-    unseen_child_modules_for_parent = {
-        parent_name: _get_child_module_names_for_module(parent_name)
-        for parent_name in set(module_name_to_parent.values())
-    }
+    return parentless_module_names, seen_child_modules_for_parent
+
+
+def _replace_grouped_child_modules_with_parent(
+    parentless_module_names: Set[str],
+    seen_child_modules_for_parent: DefaultDict[str, Set[str]],
+) -> FrozenSet[str]:
+    # Run to convergence. Each parent's child modules are only enumerated once across all
+    # iterations, so later iterations don't need to touch the disk again.
+    while True:
+        # For any parent_name, if we see all its child modules, we can replace all the child
+        # module names with the name of the parent module.
+        parents_with_all_children_seen = {
+            parent_name
+            for parent_name, seen_child_modules in seen_child_modules_for_parent.items()
+            if _get_child_module_names_for_module(parent_name) <= seen_child_modules
+        }
+
+        final_modules = set(parentless_module_names)
+        final_modules.update(parents_with_all_children_seen)
+        for parent_name, seen_child_modules in seen_child_modules_for_parent.items():
+            if parent_name not in parents_with_all_children_seen:
+                # Not all child modules were seen, so the parent module cannot replace them.
+                final_modules.update(seen_child_modules)
+
+        if not parents_with_all_children_seen:
+            # Fixed point reached.
+            return frozenset(final_modules)
+
+        parentless_module_names, seen_child_modules_for_parent = _group_modules_by_parent(
+            final_modules
+        )
+
 
-    for module_name, parent_name in module_name_to_parent.items():
-        if module_name in unseen_child_modules_for_parent[parent_name]:
-            unseen_child_modules_for_parent[parent_name].remove(module_name)
-
-    final_modules = set(parentless_module_names)
-    for parent_name, unseen_child_modules in unseen_child_modules_for_parent.items():
-        if not unseen_child_modules:
-            # Replacing all child modules with the parent module.
-            final_modules.add(parent_name)
-    for module_name, parent_name in module_name_to_parent.items():
-        if unseen_child_modules_for_parent[parent_name]:
-            # Not all child modules were seen, so the parent module cannot replace this module.
-            final_modules.add(module_name)
-
-    # Run to convergence.
-    result = frozenset(final_modules)
-    if result == original_module_names:
-        # Fixed point reached.
-        return result
-    else:
-        # Not yet at fixed point, try again.
-        return _consider_replacing_child_modules_with_parent(result)
+def _collapse_modules(module_names: AbstractSet[str]) -> FrozenSet[str]:
+    """Find the minimum covering modules, then replace all child modules of X with X itself."""
+    # This is technically not exactly equivalent, since the parent module X includes all code
+    # present in the __init__.py of the module, as well as all child modules. However, without this
+    # transformation, the generated mypy config files are likely going to be absolutely massive!
+    # Additionally, __init__.py files tend to be relatively small, so the risk of hiding
+    # unexpected additional errors with this over-broad suppression is relatively small.
+    # If we ever want to fix this "for good", we could just check the contents of the __init__.py
+    # and only apply this transformation if the file is empty.
+    return _replace_grouped_child_modules_with_parent(
+        *_group_modules_by_parent(_find_minimum_covering_modules(module_names))
+    )
 
 
 # ##############
@@ -204,11 +271,20 @@ def _consider_replacing_child_modules_with_parent(module_names: AbstractSet[str]
 # ##############
 
 
-def get_3rd_party_modules_missing_type_hints(errors: List[MypyError]) -> FrozenSet[str]:
-    import_errors = [error for error in errors if error.error_code == "import"]
+def bucket_errors_by_code(errors: List[MypyError]) -> Dict[str, List[MypyError]]:
+    """Group the given errors by their error code, in a single pass over the errors."""
+    errors_by_code: DefaultDict[str, List[MypyError]] = defaultdict(list)
+    for error in errors:
+        errors_by_code[error.error_code].append(error)
+
+    return dict(errors_by_code)
+
 
+def get_3rd_party_modules_missing_type_hints(
+    errors_by_code: Mapping[str, List[MypyError]],
+) -> FrozenSet[str]:
     module_names: Set[str] = set()
-    for import_error in import_errors:
+    for import_error in errors_by_code.get("import", []):
         module_name_match = _module_missing_type_hint_pattern.match(import_error.message)
         if module_name_match is None:
             module_name_match = _module_missing_implementation_or_library_stub_pattern.match(
@@ -233,16 +309,27 @@ def get_3rd_party_modules_missing_type_hints(errors: List[MypyError]) -> FrozenS
 
 
 def get_1st_party_modules_and_suppressions(
-    errors: List[MypyError],
+    errors_by_code: Mapping[str, List[MypyError]],
 ) -> Dict[str, List[MypyErrorSetting]]:
-    non_import_errors = [error for error in errors if error.error_code != "import"]
-
     needed_setting_to_modules: Dict[MypyErrorSetting, Set[str]] = {}
-    for error in non_import_errors:
-        error_setting = _get_error_setting_for_error(error)
-        module_name = _get_module_for_error(error)
+    seen_settings_and_file_paths: Set[Tuple[MypyErrorSetting, str]] = set()
+    for error_code, errors in errors_by_code.items():
+        if error_code == "import":
+            # Import errors are handled as part of the 3rd party module rules.
+            continue
 
-        needed_setting_to_modules.setdefault(error_setting, set()).add(module_name)
+        for error in errors:
+            error_setting = _get_error_setting_for_error(error)
+
+            # Files often have many errors requiring the same setting. Since the module is
+            # determined by the file alone, only look it up once per setting and file.
+            setting_and_file_path = (error_setting, error.file_path)
+            if setting_and_file_path in seen_settings_and_file_paths:
+                continue
+            seen_settings_and_file_paths.add(setting_and_file_path)
+
+            module_name = _get_module_for_error(error)
+            needed_setting_to_modules.setdefault(error_setting, set()).add(module_name)
 
     # Apply all settings that are dependencies of settings that are needed here.
     for dependent_setting, dependencies in _settings_that_require_other_settings.items():
@@ -255,11 +342,11 @@ def get_1st_party_modules_and_suppressions(
 
     # Discard any modules for which the setting would be implied through an ancestor module.
     needed_setting_to_minimum_covering_modules: Dict[MypyErrorSetting, FrozenSet[str]] = {
-        error_setting: _consider_replacing_child_modules_with_parent(
-            _find_minimum_covering_modules(module_names)
-        )
+        error_setting: _collapse_modules(module_names)
         for error_setting, module_names in needed_setting_to_modules.items()
     }
+    # Persist any child modules found while collapsing, so later runs don't need to find them again.
+    write_child_modules_caches()
 
     module_to_error_settings: Dict[str, List[MypyErrorSetting]] = {}
     for error_setting, minimum_module_names in needed_setting_to_minimum_covering_modules.items():
@@ -281,3 +368,14 @@ def find_unused_ignores(errors: List[MypyError]) -> List[MypyError]:
             result.append(error)
 
     return result
+
+
+def all_errors_have_known_settings(errors: List[MypyError]) -> bool:
+    """Return whether explicit rules, not the catch-all heuristic, map all errors to settings."""
+    # Errors that only the catch-all heuristic maps to a setting may not actually go away
+    # with that setting, so a config built from them must be validated with another mypy run.
+    return all(
+        error.error_code == "import"
+        or _get_error_setting_for_error(error) != _remaining_error_setting
+        for error in errors
+    )
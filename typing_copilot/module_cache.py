@@ -0,0 +1,96 @@
+import json
+import os
+from os import path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .mypy_runner import get_cache_dir
+
+
+# Finding a package's child modules requires walking its directory tree and importing all its
+# subpackages, and the result rarely changes between runs. We therefore store the child modules
+# of each package on disk, together with the fingerprint of the package's directories.
+_CHILD_MODULES_CACHE_FILE_NAME = "child_modules.json"
+
+
+def _get_child_modules_cache_path() -> str:
+    return path.join(get_cache_dir(), _CHILD_MODULES_CACHE_FILE_NAME)
+
+
+# The loaded caches, keyed by the path of their file, since the cache directory may change.
+# They are written back to disk at most once per run, by write_child_modules_caches().
+_child_modules_caches: Dict[str, Dict[str, Dict[str, object]]] = {}
+_unwritten_child_modules_cache_paths: Set[str] = set()
+
+
+def _load_child_modules_cache_file(cache_path: str) -> Dict[str, Dict[str, object]]:
+    try:
+        with open(cache_path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+
+def _get_child_modules_cache() -> Dict[str, Dict[str, object]]:
+    cache_path = _get_child_modules_cache_path()
+    cache = _child_modules_caches.get(cache_path)
+    if cache is None:
+        cache = _load_child_modules_cache_file(cache_path)
+        _child_modules_caches[cache_path] = cache
+
+    return cache
+
+
+def get_package_fingerprint(package_paths: Iterable[str]) -> str:
+    """Fingerprint the directories of a package, to detect added or removed (sub)modules."""
+    # Adding, removing or renaming a file changes the mtime of the directory that contains it,
+    # so the mtimes of the package's directories are enough to tell whether its modules changed.
+    fingerprint_parts: List[str] = []
+    for package_path in package_paths:
+        for dir_path, dir_names, _ in os.walk(package_path):
+            dir_names[:] = sorted(
+                dir_name
+                for dir_name in dir_names
+                if not dir_name.startswith(".") and dir_name != "__pycache__"
+            )
+            fingerprint_parts.append(f"{dir_path}:{os.stat(dir_path).st_mtime_ns}")
+
+    return "\n".join(fingerprint_parts)
+
+
+def load_child_module_names(module_name: str, package_fingerprint: str) -> Optional[FrozenSet[str]]:
+    cache_entry = _get_child_modules_cache().get(module_name)
+    if not isinstance(cache_entry, dict) or cache_entry.get("fingerprint") != package_fingerprint:
+        return None
+
+    child_module_names = cache_entry.get("child_module_names")
+    if not isinstance(child_module_names, list):
+        return None
+
+    return frozenset(child_module_names)
+
+
+def save_child_module_names(
+    module_name: str, package_fingerprint: str, child_module_names: FrozenSet[str]
+) -> None:
+    """Add the child modules to the cache, to be written to disk by write_child_modules_caches()."""
+    _get_child_modules_cache()[module_name] = {
+        "fingerprint": package_fingerprint,
+        "child_module_names": sorted(child_module_names),
+    }
+    _unwritten_child_modules_cache_paths.add(_get_child_modules_cache_path())
+
+
+def write_child_modules_caches() -> None:
+    """Write any caches with newly-saved child modules to disk."""
+    for cache_path in sorted(_unwritten_child_modules_cache_paths):
+        # Write to a temporary file that is then moved into place, so that an interrupted write
+        # can never leave behind a truncated cache file.
+        os.makedirs(path.dirname(cache_path), exist_ok=True)
+        temporary_path = cache_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(json.dumps(_child_modules_caches[cache_path]).encode("utf-8"))
+        os.replace(temporary_path, cache_path)
+
+    _unwritten_child_modules_cache_paths.clear()
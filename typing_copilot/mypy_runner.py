@@ -1,100 +1,574 @@
-from dataclasses import dataclass
+import ast
+import configparser
+from functools import lru_cache
+import hashlib
+import json
 import os
 from os import path
+from pathlib import Path
+import re
 import subprocess
-from tempfile import TemporaryDirectory
-from typing import List, Type, TypeVar, Optional
+import sys
+import threading
+from typing import Iterable, List, Match, NamedTuple, Optional, Set, Tuple, Type, TypeVar
 
-from .verbosity import log_if_verbose
+from mypy import api as mypy_api
+from mypy import version as mypy_version
 
+from . import verbosity
 
-def run_mypy_with_config_file(mypy_config_path: str) -> subprocess.CompletedProcess:
-    run_args = [
-        "mypy",
+
+# All mypy runs share the same cache directory, so that each run is able to reuse the results of
+# previous runs through mypy's incremental mode instead of re-checking the project from scratch.
+# The generated mypy config files are also stored here.
+DEFAULT_CACHE_DIR = ".typing_copilot_cache"
+CACHE_DIR_ENV_VAR = "TYPING_COPILOT_CACHE_DIR"
+
+# Changes to any files with these extensions are assumed to potentially change mypy's output.
+# The project's own mypy.ini is not included: we always pass mypy an explicit config file.
+_FINGERPRINTED_FILE_EXTENSIONS = (".py", ".pyi", ".cfg", ".toml")
+
+# mypy does not look for source files in these directories, nor in directories whose names
+# start with a ".", so neither do we.
+_UNFINGERPRINTED_DIR_NAMES = frozenset({"__pycache__", "site-packages", "node_modules"})
+
+# Each changed project or config leads to a new memoized run and possibly a new config file,
+# so only this many of the most recently used ones are kept, to bound the cache's size.
+_MAX_MEMOIZED_RUNS = 16
+_MAX_MYPY_CONFIG_FILES = 16
+
+# Packages installed in editable mode with an import hook record the location of their
+# top-level modules in a module-level dict, e.g.: MAPPING: dict[str, str] = {"foo": "/src/foo"}
+_editable_finder_mapping_pattern = re.compile(r"^MAPPING\b[^=\n]*=\s*(\{.*\})\s*$", re.MULTILINE)
+
+# Rebound by set_cache_dir(), e.g. to persist the cache in a location that CI can save and restore.
+_cache_dir = DEFAULT_CACHE_DIR
+
+# Rebound by set_reuse_previous_runs(). When disabled, the only memoized runs that are reused
+# are the ones that this process memoized itself.
+_reuse_previous_runs = True
+_memoized_run_paths_saved_by_this_process: Set[str] = set()
+
+
+def set_cache_dir(cache_dir: str) -> None:
+    global _cache_dir
+    _cache_dir = cache_dir
+
+
+def get_cache_dir() -> str:
+    return _cache_dir
+
+
+def set_reuse_previous_runs(reuse_previous_runs: bool) -> None:
+    global _reuse_previous_runs
+    _reuse_previous_runs = reuse_previous_runs
+
+
+def _get_memoized_mypy_runs_dir() -> str:
+    # Outputs of previous mypy runs, reused if neither the config nor the project has changed.
+    return path.join(_cache_dir, "runs")
+
+
+def _get_background_mypy_cache_dir() -> str:
+    # mypy's cache is not safe for concurrent use, so background runs get their own cache directory.
+    return path.join(_cache_dir, "background")
+
+
+def _make_mypy_run_args(mypy_config_path: str, cache_dir: str) -> List[str]:
+    return [
         "--config-file",
         mypy_config_path,
+        "--incremental",
+        "--cache-dir",
+        cache_dir,
         "--show-error-codes",
         "--error-summary",
         ".",
     ]
-    log_if_verbose(f"Running mypy with {run_args}")
-    completed_process = subprocess.run(run_args, capture_output=True, encoding="utf-8")
-    log_if_verbose(
-        f"Run completed with exit code {completed_process.returncode}. "
-        f"Stdout: ***\n{completed_process.stdout}\n***"
-    )
+
+
+def _log_completed_mypy_run(completed_process: subprocess.CompletedProcess) -> None:
+    if verbosity.verbose_mode_enabled:
+        verbosity.log_if_verbose(
+            f"Run completed with exit code {completed_process.returncode}. "
+            f"Stdout: ***\n{completed_process.stdout}\n***"
+        )
+
+
+def run_mypy_with_config_file(mypy_config_path: str) -> subprocess.CompletedProcess:
+    run_args = _make_mypy_run_args(mypy_config_path, _cache_dir)
+    verbosity.log_if_verbose(f"Running mypy with {run_args}")
+
+    # Run mypy in-process rather than spawning a new interpreter for every run. We wrap its result
+    # in a CompletedProcess so that callers can treat it like the output of the mypy binary.
+    stdout, stderr, exit_code = mypy_api.run(run_args)
+    completed_process = subprocess.CompletedProcess(["mypy"] + run_args, exit_code, stdout, stderr)
+    _log_completed_mypy_run(completed_process)
     return completed_process
 
 
+def _is_inside_dir(file_path: str, dir_path: str) -> bool:
+    absolute_file_path = path.abspath(file_path)
+    absolute_dir_path = path.abspath(dir_path)
+    return absolute_file_path == absolute_dir_path or absolute_file_path.startswith(
+        absolute_dir_path + os.sep
+    )
+
+
+def _is_installed_packages_dir(import_path: str) -> bool:
+    # The standard library and installed packages live inside the interpreter's prefixes,
+    # or in "site-packages" directories such as the user's own.
+    return any(
+        _is_inside_dir(import_path, prefix)
+        for prefix in {sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix}
+    ) or any(
+        dir_name in {"site-packages", "dist-packages"} for dir_name in import_path.split(os.sep)
+    )
+
+
+def _get_editable_install_roots(installed_packages_dir: str) -> List[str]:
+    """Return the source directories of packages installed in editable mode with import hooks."""
+    # Editable installs either add their source directory to the import path through a ".pth"
+    # file, in which case it is in sys.path already, or install an import hook whose module
+    # records where each of the package's top-level modules is located.
+    editable_install_roots: List[str] = []
+    try:
+        dir_entries = list(os.scandir(installed_packages_dir))
+    except OSError:
+        return editable_install_roots
+
+    for dir_entry in dir_entries:
+        if dir_entry.name.startswith("__editable__") and dir_entry.name.endswith("_finder.py"):
+            try:
+                with open(dir_entry.path, "r") as finder_file:
+                    mapping_match = _editable_finder_mapping_pattern.search(finder_file.read())
+                if mapping_match is None:
+                    continue
+                mapping = ast.literal_eval(mapping_match.group(1))
+            except (OSError, ValueError, SyntaxError):
+                continue
+
+            if isinstance(mapping, dict):
+                editable_install_roots.extend(
+                    module_path for module_path in mapping.values() if isinstance(module_path, str)
+                )
+
+    return editable_install_roots
+
+
+# Each source tree is only walked once per run, even if it is e.g. on both sys.path and MYPYPATH.
+@lru_cache(maxsize=None)
+def _get_source_tree_fingerprint(root_path: str) -> str:
+    """Fingerprint the source files, and any config files that mypy plugins might read."""
+    if path.isfile(root_path):
+        # e.g. a single-module package installed in editable mode.
+        root_stat = os.stat(root_path)
+        return f"{root_path}:{root_stat.st_mtime_ns}:{root_stat.st_size}"
+
+    # Our own cache directory is skipped, in case it was configured to be inside the tree.
+    absolute_cache_dir = path.abspath(_cache_dir)
+    fingerprint_parts: List[str] = []
+    for dir_path, dir_names, file_names in os.walk(root_path):
+        dir_names[:] = sorted(
+            dir_name
+            for dir_name in dir_names
+            if not dir_name.startswith(".")
+            and dir_name not in _UNFINGERPRINTED_DIR_NAMES
+            and path.abspath(path.join(dir_path, dir_name)) != absolute_cache_dir
+        )
+        for file_name in sorted(file_names):
+            if file_name.endswith(_FINGERPRINTED_FILE_EXTENSIONS) or file_name == "py.typed":
+                file_path = path.join(dir_path, file_name)
+                try:
+                    file_stat = os.stat(file_path)
+                except OSError:
+                    # e.g. a broken symlink. Record that the file is unreadable, so that
+                    # the fingerprint still changes if the file later becomes readable.
+                    fingerprint_parts.append(f"{file_path}:unreadable")
+                    continue
+
+                fingerprint_parts.append(f"{file_path}:{file_stat.st_mtime_ns}:{file_stat.st_size}")
+
+    return "\n".join(fingerprint_parts)
+
+
+def _get_source_trees_fingerprint(root_paths: Iterable[str]) -> List[str]:
+    # Source trees inside the project are already part of the project's own fingerprint.
+    project_path = os.getcwd()
+    return [
+        _get_source_tree_fingerprint(path.abspath(root_path))
+        for root_path in root_paths
+        if not _is_inside_dir(root_path, project_path) and path.exists(root_path)
+    ]
+
+
+# Nothing we fingerprint changes while we are running, so we only compute the fingerprint once
+# instead of walking the project again for every mypy run.
+@lru_cache(maxsize=1)
+def _get_environment_fingerprint() -> str:
+    """Fingerprint everything other than the mypy config that could affect mypy's output."""
+    mypy_path_env_var = os.environ.get("MYPYPATH", "")
+    fingerprint_parts = [mypy_version.__version__, sys.version, mypy_path_env_var]
+
+    # Installing or removing packages (e.g. type stubs) modifies the import path directories.
+    # Any other import paths hold source code, e.g. from PYTHONPATH, ".pth" files or packages
+    # installed in editable mode, so their contents are fingerprinted like the project's.
+    # Import paths inside the project are skipped: the project is fingerprinted separately below,
+    # and its directories' mtimes change whenever e.g. the mypy.ini file is rewritten.
+    project_path = os.getcwd()
+    source_roots: List[str] = []
+    for import_path in sys.path:
+        if _is_inside_dir(import_path, project_path) or not path.isdir(import_path):
+            continue
+
+        if _is_installed_packages_dir(import_path):
+            fingerprint_parts.append(f"{import_path}:{os.stat(import_path).st_mtime_ns}")
+            source_roots.extend(_get_editable_install_roots(import_path))
+        else:
+            source_roots.append(import_path)
+
+    # Directories on MYPYPATH are searched for stubs and source code before the import path.
+    source_roots.extend(mypy_path for mypy_path in mypy_path_env_var.split(os.pathsep) if mypy_path)
+    fingerprint_parts.extend(_get_source_trees_fingerprint(source_roots))
+
+    # The project's own source files.
+    fingerprint_parts.append(_get_source_tree_fingerprint("."))
+
+    return "\n".join(fingerprint_parts)
+
+
+def _get_config_mypy_path_fingerprint(mypy_config: str, mypy_config_dir: str) -> str:
+    """Fingerprint the source trees in the "mypy_path" setting of the given mypy config."""
+    config_parser = configparser.ConfigParser(interpolation=None)
+    try:
+        config_parser.read_string(mypy_config)
+    except configparser.Error:
+        # mypy will report the error, and the config itself is part of the memoization key.
+        return ""
+
+    mypy_path_setting = config_parser.get("mypy", "mypy_path", fallback="")
+    if not mypy_path_setting:
+        return ""
+
+    # Like mypy: paths are separated by commas or colons, may contain environment variables
+    # including $MYPY_CONFIG_FILE_DIR, and are otherwise relative to the working directory.
+    mypy_path_setting = mypy_path_setting.replace(
+        "${MYPY_CONFIG_FILE_DIR}", mypy_config_dir
+    ).replace("$MYPY_CONFIG_FILE_DIR", mypy_config_dir)
+    mypy_paths = [
+        path.expanduser(path.expandvars(mypy_path.strip()))
+        for mypy_path in re.split("[,:]", mypy_path_setting)
+        if mypy_path.strip()
+    ]
+    return "\n".join(_get_source_trees_fingerprint(mypy_paths))
+
+
+def _prune_least_recently_used_files(
+    dir_path: str, file_name_prefix: str, file_name_suffix: str, max_file_count: int
+) -> None:
+    """Delete all but the max_file_count most recently modified matching files in dir_path."""
+    file_mtimes_and_paths: List[Tuple[int, str]] = []
+    for dir_entry in os.scandir(dir_path):
+        if dir_entry.name.startswith(file_name_prefix) and dir_entry.name.endswith(
+            file_name_suffix
+        ):
+            try:
+                file_mtimes_and_paths.append((dir_entry.stat().st_mtime_ns, dir_entry.path))
+            except OSError:
+                # Deleted concurrently, e.g. by another typing_copilot process.
+                pass
+
+    file_mtimes_and_paths.sort(reverse=True)
+    for _, file_path in file_mtimes_and_paths[max_file_count:]:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+def _load_memoized_mypy_run(memoized_run_path: str) -> Optional[subprocess.CompletedProcess]:
+    try:
+        with open(memoized_run_path, "r") as memoized_run_file:
+            memoized_run = json.load(memoized_run_file)
+        # Mark the memoized run as recently used, so it is not the next one to be pruned.
+        os.utime(memoized_run_path)
+    except (OSError, ValueError):
+        return None
+
+    return subprocess.CompletedProcess(
+        memoized_run["args"],
+        memoized_run["returncode"],
+        memoized_run["stdout"],
+        memoized_run["stderr"],
+    )
+
+
+def _save_memoized_mypy_run(
+    memoized_run_path: str, completed_process: subprocess.CompletedProcess
+) -> None:
+    memoized_run = {
+        "args": completed_process.args,
+        "returncode": completed_process.returncode,
+        "stdout": completed_process.stdout,
+        "stderr": completed_process.stderr,
+    }
+    os.makedirs(path.dirname(memoized_run_path), exist_ok=True)
+    with open(memoized_run_path, "w") as memoized_run_file:
+        json.dump(memoized_run, memoized_run_file)
+    _memoized_run_paths_saved_by_this_process.add(memoized_run_path)
+
+    _prune_least_recently_used_files(
+        path.dirname(memoized_run_path), "", ".json", _MAX_MEMOIZED_RUNS
+    )
+
+
+def _get_memoized_run_path(mypy_config: str, mypy_config_path: Optional[str] = None) -> str:
+    # Given the same config and the same project and environment, mypy produces the same output.
+    # We reuse the output of any previous identical run, so unchanged projects need no re-checking.
+    # mypy resolves some paths in the config relative to the config file's directory, so configs
+    # read from an existing file are keyed by that file's path as well. Generated configs are
+    # written to the cache directory, where mypy then reads them from.
+    absolute_mypy_config_path = "" if mypy_config_path is None else path.abspath(mypy_config_path)
+    mypy_config_dir = (
+        path.abspath(_cache_dir)
+        if mypy_config_path is None
+        else path.dirname(absolute_mypy_config_path)
+    )
+    mypy_path_fingerprint = _get_config_mypy_path_fingerprint(mypy_config, mypy_config_dir)
+    memoization_key = hashlib.blake2b(
+        "\0".join(
+            (
+                mypy_config,
+                absolute_mypy_config_path,
+                _get_environment_fingerprint(),
+                mypy_path_fingerprint,
+            )
+        ).encode("utf-8")
+    ).hexdigest()
+    return path.join(_get_memoized_mypy_runs_dir(), f"{memoization_key}.json")
+
+
+def _load_memoized_run_for_config(
+    mypy_config: str, mypy_config_path: Optional[str] = None
+) -> Tuple[str, Optional[subprocess.CompletedProcess]]:
+    memoized_run_path = _get_memoized_run_path(mypy_config, mypy_config_path)
+    if (
+        not _reuse_previous_runs
+        and memoized_run_path not in _memoized_run_paths_saved_by_this_process
+    ):
+        return memoized_run_path, None
+
+    memoized_completed_process = _load_memoized_mypy_run(memoized_run_path)
+    if memoized_completed_process is not None and verbosity.verbose_mode_enabled:
+        verbosity.log_if_verbose(
+            f"Reusing the output of a previous identical mypy run from {memoized_run_path}: "
+            f"***\n{memoized_completed_process.stdout}\n***"
+        )
+
+    return memoized_run_path, memoized_completed_process
+
+
+def _memoize_run_if_completed(
+    memoized_run_path: str, completed_process: subprocess.CompletedProcess
+) -> None:
+    if completed_process.returncode in {0, 1}:
+        # Only memoize runs that completed normally, i.e. that did or did not find errors.
+        # If mypy crashed, a later run might not.
+        _save_memoized_mypy_run(memoized_run_path, completed_process)
+
+
+def _write_mypy_config_file(mypy_config: str) -> str:
+    # Name the config file after its contents, so that identical configs map to the same file.
+    config_hash = hashlib.sha256(mypy_config.encode("utf-8")).hexdigest()
+    os.makedirs(_cache_dir, exist_ok=True)
+    mypy_config_path = path.join(_cache_dir, f"mypy-{config_hash}.ini")
+    if verbosity.verbose_mode_enabled:
+        verbosity.log_if_verbose(f"Writing mypy config file {mypy_config_path}:\n\n{mypy_config}\n")
+    # No need to fsync: mypy reads the file right after it is closed, so it is served from
+    # the OS page cache, and the file is only ever useful to this process anyway.
+    Path(mypy_config_path).write_text(mypy_config)
+    _prune_least_recently_used_files(_cache_dir, "mypy-", ".ini", _MAX_MYPY_CONFIG_FILES)
+
+    return mypy_config_path
+
+
 def run_mypy_with_config(mypy_config: str) -> subprocess.CompletedProcess:
-    with TemporaryDirectory(prefix="mypy-copilot-") as temp_dir:
-        mypy_config_path = path.join(temp_dir, "mypy.ini")
-        with open(mypy_config_path, "w") as mypy_config_file:
-            log_if_verbose(f"Writing temporary mypy config file:\n\n{mypy_config}\n")
-            mypy_config_file.write(mypy_config)
-            mypy_config_file.flush()
-            os.fsync(mypy_config_file.fileno())
+    memoized_run_path, memoized_completed_process = _load_memoized_run_for_config(mypy_config)
+    if memoized_completed_process is not None:
+        return memoized_completed_process
+
+    completed_process = run_mypy_with_config_file(_write_mypy_config_file(mypy_config))
+    _memoize_run_if_completed(memoized_run_path, completed_process)
+    return completed_process
+
+
+def run_mypy_with_existing_config_file(
+    mypy_config_path: str, mypy_config: str
+) -> subprocess.CompletedProcess:
+    """Run mypy with an existing config file, whose contents are given by mypy_config."""
+    # Unlike with run_mypy_with_config(), mypy reads this exact file, so relative paths in it
+    # behave the same way as when the user runs mypy with it.
+    memoized_run_path, memoized_completed_process = _load_memoized_run_for_config(
+        mypy_config, mypy_config_path
+    )
+    if memoized_completed_process is not None:
+        return memoized_completed_process
+
+    completed_process = run_mypy_with_config_file(mypy_config_path)
+    _memoize_run_if_completed(memoized_run_path, completed_process)
+    return completed_process
+
+
+class BackgroundMypyRun:
+    """A mypy run that runs in the background, concurrently with any in-process mypy runs."""
+
+    def __init__(self, mypy_config: str) -> None:
+        self._process: Optional[subprocess.Popen] = None
+        self._output_reader: Optional[threading.Thread] = None
+        self._output: Tuple[str, str] = ("", "")
+
+        self._memoized_run_path, self._completed_process = _load_memoized_run_for_config(
+            mypy_config
+        )
+        if self._completed_process is not None:
+            return
+
+        # mypy keeps global state while type-checking, so concurrent runs cannot all happen
+        # in-process. Background runs use a separate mypy process with a cache directory of its own.
+        self._run_args = [sys.executable, "-m", "mypy"] + _make_mypy_run_args(
+            _write_mypy_config_file(mypy_config), _get_background_mypy_cache_dir()
+        )
+        verbosity.log_if_verbose(f"Running mypy in the background with {self._run_args}")
+        self._process = subprocess.Popen(
+            self._run_args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+        )
+
+        # Consume mypy's output as it is produced, so that mypy never blocks on a full pipe.
+        self._output_reader = threading.Thread(target=self._read_output, daemon=True)
+        self._output_reader.start()
+
+    def _read_output(self) -> None:
+        if self._process is None:
+            raise AssertionError(f"Attempting to read output without a mypy process: {self}")
+
+        self._output = self._process.communicate()
+
+    def result(self) -> subprocess.CompletedProcess:
+        """Wait for the mypy run to complete, and return its result."""
+        if self._completed_process is not None:
+            return self._completed_process
+
+        if self._process is None or self._output_reader is None:
+            raise AssertionError(f"Background mypy run has neither a process nor a result: {self}")
+
+        self._output_reader.join()
+        stdout, stderr = self._output
+        self._completed_process = subprocess.CompletedProcess(
+            self._run_args, self._process.returncode, stdout, stderr
+        )
+        _log_completed_mypy_run(self._completed_process)
+        _memoize_run_if_completed(self._memoized_run_path, self._completed_process)
+        return self._completed_process
+
+    def cancel(self) -> None:
+        """Stop the mypy run if it is still running, since its result is no longer needed."""
+        if self._process is not None and self._completed_process is None:
+            verbosity.log_if_verbose(f"Stopping background mypy run {self._run_args}")
+            self._process.kill()
+            if self._output_reader is not None:
+                self._output_reader.join()
 
-        return run_mypy_with_config_file(mypy_config_path)
+
+def run_mypy_with_config_async(mypy_config: str) -> BackgroundMypyRun:
+    """Start a mypy run in the background, so that it can overlap with an in-process mypy run."""
+    return BackgroundMypyRun(mypy_config)
 
 
 MypyErrorT = TypeVar("MypyErrorT", bound="MypyError")
 
 
-@dataclass(frozen=True, order=True)
-class MypyError:
+# Matches a line of mypy output that reports an error, such as:
+#   foo/bar.py:12: error: Function is missing a type annotation  [no-untyped-def]
+# Lines with notes (e.g. "foo/bar.py:12: note: ...") and the final summary line are not matched.
+# It seems the errors emitted by the "warn_unused_ignores" check do not have error codes,
+# so the error code is optional. Lines may end in either "\n" or "\r\n".
+_mypy_error_line_pattern = re.compile(
+    r"^[ \t]*(?P<file_path>[^:\n]+?)[ \t]*:[ \t]*(?P<line_number>\d+)[ \t]*:[ \t]*(?![ \t]|note:)"
+    r"(?P<message>[^\r\n]*?)(?:[ \t]*\[(?P<error_code>[^\[\]\r\n]*)\])?[ \t\r]*$",
+    re.MULTILINE,
+)
+
+
+# Large projects may produce many thousands of errors, so this is a NamedTuple rather than
+# a dataclass: its instances are compact tuples without a per-instance __dict__.
+class MypyError(NamedTuple):
     file_path: str
     line_number: int
     error_code: str
     message: str
 
+    @classmethod
+    def _from_match(cls: Type[MypyErrorT], match: Match[str]) -> MypyErrorT:
+        # Use the empty string as the error code of errors that do not have one.
+        # There are only a few distinct error codes and file paths across potentially many
+        # thousands of errors, so we intern them to share a single copy of each string.
+        return cls(
+            sys.intern(match.group("file_path")),
+            int(match.group("line_number")),
+            sys.intern((match.group("error_code") or "").strip()),
+            match.group("message"),
+        )
+
     @classmethod
     def from_mypy_output_line(cls: Type[MypyErrorT], line: str) -> Optional[MypyErrorT]:
-        file_path, line_num, rest_of_line = line.split(":", 2)
-        file_path = file_path.strip()
-        line_number = int(line_num.strip())
-
-        rest_of_line = rest_of_line.strip()
-        if rest_of_line.startswith("note:"):
-            # This is not an error, ignore it.
-            return None
-
-        if "[" not in rest_of_line:
-            # It seems the errors emitted by the "warn_unused_ignores" check
-            # do not have error codes. Use the empty string for their error code.
-            message = rest_of_line
-            error_code = ""
-        else:
-            message, error_code = rest_of_line.rsplit("[", 1)
-            message = message.strip()
-            error_code = error_code.strip().strip("]").rstrip()
+        match = _mypy_error_line_pattern.match(line)
+        if match is None:
+            if line.split(":", 2)[-1].strip().startswith("note:"):
+                # This is not an error, ignore it.
+                return None
 
-        return cls(file_path, line_number, error_code, message)
+            raise AssertionError(f"Unrecognized mypy output line: {line}")
 
+        return cls._from_match(match)
 
-def get_mypy_errors_from_completed_process(
-    completed_process: subprocess.CompletedProcess,
-) -> List[MypyError]:
-    output_lines = completed_process.stdout.strip().split("\n")
+
+# The final line of mypy's output, e.g. "Success: no issues found in 3 source files" or
+# "Found 2 errors in 1 file (checked 3 source files)".
+_success_output_prefix = "Success: no issues found"
+_errors_found_output_pattern = re.compile(r"Found (\d+) errors? ")
+
+
+def _get_last_output_line(output: str) -> str:
+    # Only the final line of mypy's output is needed to determine the result of the run, so we find
+    # it directly instead of splitting the potentially very large output into a list of lines.
+    end_index = len(output)
+    while end_index > 0 and output[end_index - 1].isspace():
+        end_index -= 1
+    start_index = output.rfind("\n", 0, end_index) + 1
+    return output[start_index:end_index]
+
+
+def any_mypy_errors(completed_process: subprocess.CompletedProcess) -> bool:
+    """Return whether mypy reported any errors, without parsing them."""
+    last_output_line = _get_last_output_line(completed_process.stdout)
     if completed_process.returncode == 0:
-        if not output_lines[-1].startswith("Success: no issues found"):
-            raise AssertionError(f"Unexpected output for mypy exit code 0: {output_lines}")
+        if not last_output_line.startswith(_success_output_prefix):
+            raise AssertionError(
+                f"Unexpected output for mypy exit code 0: {completed_process.stdout}"
+            )
 
-        return []
+        return False
     elif completed_process.returncode == 1:
-        if not (output_lines[-1].startswith("Found ") and " error" in output_lines[-1]):
-            stderr_lines = completed_process.stderr.strip().split("\n")
+        if _errors_found_output_pattern.match(last_output_line) is None:
             raise AssertionError(
-                f"Unexpected output for mypy exit code 1. Mypy stdout: {output_lines}, "
-                f"stderr: {stderr_lines}"
+                f"Unexpected output for mypy exit code 1. Mypy stdout: {completed_process.stdout}, "
+                f"stderr: {completed_process.stderr}"
             )
 
-        error_lines = output_lines[:-1]
-        return [
-            value
-            for value in (MypyError.from_mypy_output_line(error_line) for error_line in error_lines)
-            if value is not None
-        ]
+        return True
     else:
         raise AssertionError(
             f"Unexpected mypy exit code {completed_process.returncode}. "
@@ -102,6 +576,40 @@ def get_mypy_errors_from_completed_process(
         )
 
 
+def get_mypy_errors_from_completed_process(
+    completed_process: subprocess.CompletedProcess,
+) -> List[MypyError]:
+    if not any_mypy_errors(completed_process):
+        return []
+
+    # Parse all errors in a single pass over the output, rather than line by line.
+    errors = [
+        MypyError._from_match(match)
+        for match in _mypy_error_line_pattern.finditer(completed_process.stdout)
+    ]
+
+    # The single pass skips any lines it does not recognize, so make sure it found every error
+    # that mypy reported. If not, find the first unrecognized line and fail loudly.
+    errors_found_match = _errors_found_output_pattern.match(
+        _get_last_output_line(completed_process.stdout)
+    )
+    if errors_found_match is None:
+        raise AssertionError(f"Unexpected mypy output: {completed_process.stdout}")
+    reported_error_count = int(errors_found_match.group(1))
+    if len(errors) != reported_error_count:
+        for line in completed_process.stdout.splitlines():
+            if line.strip() and _errors_found_output_pattern.match(line) is None:
+                # Raises an error if the line is not recognized.
+                MypyError.from_mypy_output_line(line)
+
+        raise AssertionError(
+            f"Found {len(errors)} errors in mypy's output, but mypy reported "
+            f"{reported_error_count}: {completed_process.stdout}"
+        )
+
+    return errors
+
+
 def get_mypy_errors_for_run_with_config(mypy_config: str) -> List[MypyError]:
     completed_process = run_mypy_with_config(mypy_config)
     return get_mypy_errors_from_completed_process(completed_process)
@@ -27,6 +27,11 @@ def find_pyproject_toml(search_path: Path) -> Optional[Path]:
 class TypingCopilotConfig:
     mypy_global_config: Mapping[str, Any]
 
+    def __hash__(self) -> int:
+        # The config values may be unhashable (e.g. lists of plugins), so hash only the keys.
+        # This stays consistent with equality, and makes configs usable as cache keys.
+        return hash(frozenset(self.mypy_global_config.keys()))
+
     @classmethod
     def from_toml(cls: Type[ConfigT], toml_content: Mapping[str, Any]) -> ConfigT:
         own_config_prefix = "tool-typing_copilot"
@@ -0,0 +1,192 @@
+from contextlib import redirect_stdout
+import io
+from os import path
+from pathlib import Path
+from subprocess import CompletedProcess
+from unittest import TestCase
+from typing import List, Tuple
+from unittest.mock import Mock, patch
+
+from click.testing import CliRunner, Result
+
+from ..cli import _are_mypy_configs_equal, _exit_if_lax_baseline_run_has_errors, init, tighten
+from ..mypy_runner import any_mypy_errors, run_mypy_with_config_file
+from .test_mypy_runner import use_temporary_project_dir
+
+
+class CliTests(TestCase):
+    def test_are_mypy_configs_equal(self) -> None:
+        mypy_config = "[mypy]\nplugins =\n  foo.plugin\nstrict = True\n"
+
+        self.assertTrue(
+            _are_mypy_configs_equal(
+                mypy_config,
+                "# Comments, blank lines and trailing whitespace are not meaningful.\n\n"
+                "[mypy]  \n  \nplugins =\n  foo.plugin\n  # comment\nstrict = True\n",
+            )
+        )
+
+        # Leading whitespace continues the previous line, so these configs are not the same.
+        self.assertFalse(
+            _are_mypy_configs_equal(mypy_config, "[mypy]\nplugins =\nfoo.plugin\nstrict = True\n")
+        )
+
+    def test_exit_if_lax_baseline_run_has_errors(self) -> None:
+        lax_config = "[mypy]\nstrict_optional = False\n"
+
+        # No errors, so no need to exit.
+        _exit_if_lax_baseline_run_has_errors(
+            CompletedProcess([], 0, "Success: no issues found in 1 source file\n", ""), lax_config
+        )
+
+        output = io.StringIO()
+        with redirect_stdout(output), self.assertRaises(SystemExit) as context:
+            _exit_if_lax_baseline_run_has_errors(
+                CompletedProcess([], 1, "foo.py:1: error: Oops\nFound 1 error in 1 file\n", ""),
+                lax_config,
+            )
+        self.assertEqual(0, context.exception.code)
+        self.assertIn("Mypy found errors during our baseline run.", output.getvalue())
+        self.assertIn("foo.py:1: error: Oops", output.getvalue())
+
+    def test_exit_if_lax_baseline_run_has_errors_works_around_mypy_crash(self) -> None:
+        successful_run: CompletedProcess = CompletedProcess(
+            [], 0, "Success: no issues found in 1 source file\n", ""
+        )
+        with redirect_stdout(io.StringIO()), patch(
+            "typing_copilot.cli.run_mypy_with_config", return_value=successful_run
+        ) as run_mypy_with_config:
+            _exit_if_lax_baseline_run_has_errors(
+                CompletedProcess([], 2, "", "INTERNAL ERROR"),
+                "[mypy]\nstrict_optional = False\n",
+            )
+
+        run_mypy_with_config.assert_called_once_with("[mypy]\nstrict_optional = True\n")
+
+
+class InitTests(TestCase):
+    def setUp(self) -> None:
+        use_temporary_project_dir(self)
+
+    def _write_module_with_unsuppressible_error(self) -> None:
+        # A top-level module, so that no parent package needs to be imported to collapse modules.
+        with open("b.py", "w") as f:
+            f.write('y: int = "y"\n')
+
+    def test_init_without_errors(self) -> None:
+        for args in (["--no-validate"], ["--no-validate", "--no-parallel"], ["--validate"]):
+            with self.subTest(args=args):
+                result = CliRunner().invoke(init, args + ["--overwrite"])
+                self.assertEqual(0, result.exit_code, result.output)
+                self.assertIn("Strict run completed, no errors found.", result.output)
+                self.assertTrue(path.exists("mypy.ini"))
+
+    def test_init_with_lax_baseline_errors(self) -> None:
+        self._write_module_with_unsuppressible_error()
+        for args in (["--no-validate"], ["--no-validate", "--no-parallel"], ["--validate"]):
+            with self.subTest(args=args):
+                result = CliRunner().invoke(init, args)
+                self.assertEqual(0, result.exit_code, result.output)
+                self.assertIn("Mypy found errors during our baseline run.", result.output)
+                self.assertIn("b.py:1: error:", result.output)
+                self.assertFalse(path.exists("mypy.ini"))
+
+    def test_init_without_validation_with_suppressed_errors(self) -> None:
+        with open("c.py", "w") as f:
+            f.write("def f(x):\n    return x\n")
+
+        result = CliRunner().invoke(init, ["--no-validate"])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("validation skipped", result.output)
+        self.assertIn("[mypy-c.*]\ndisallow_untyped_defs = False\n", Path("mypy.ini").read_text())
+        self.assertFalse(any_mypy_errors(run_mypy_with_config_file("mypy.ini")))
+
+    def test_init_without_validation_with_heuristically_suppressed_errors(self) -> None:
+        with open("c.py", "w") as f:
+            f.write(
+                "from typing import Optional\n\n"
+                "def f(x):\n    return x\n\n"
+                "def h(x: Optional[int]) -> int:\n    return x + 1\n"
+            )
+
+        # The [operator] error is only heuristically attributed to "check_untyped_defs",
+        # so the config is validated, and validation catches that the error remains.
+        result = CliRunner().invoke(init, ["--no-validate"])
+        self.assertIn("needs to be validated", result.output)
+        self.assertIn("Validation failed", result.output)
+        self.assertIsInstance(result.exception, AssertionError)
+        self.assertFalse(path.exists("mypy.ini"))
+
+
+class TightenTests(TestCase):
+    def setUp(self) -> None:
+        use_temporary_project_dir(self)
+
+    def _write_module_with_untyped_def(self) -> None:
+        with open("c.py", "w") as f:
+            f.write("def f(x):\n    return x\n")
+
+    def test_tighten_without_own_mypy_ini(self) -> None:
+        result = CliRunner().invoke(tighten, [])
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("no mypy.ini was found", result.output)
+
+        Path("mypy.ini").write_text("[mypy]\nstrict = True\n")
+        result = CliRunner().invoke(tighten, [])
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("does not appear to have been generated", result.output)
+
+    def _invoke_tighten_and_check_mypy_runs(self, args: List[str]) -> Tuple[Result, Mock]:
+        with patch(
+            "typing_copilot.mypy_runner.run_mypy_with_config_file", wraps=run_mypy_with_config_file
+        ) as wrapped_run_mypy_with_config_file:
+            return CliRunner().invoke(tighten, args), wrapped_run_mypy_with_config_file
+
+    def test_tighten_with_tightest_config(self) -> None:
+        result = CliRunner().invoke(init, [])
+        self.assertEqual(0, result.exit_code, result.output)
+
+        # mypy checks the mypy.ini file itself, not a copy of it, so that relative paths in it
+        # are resolved the same way as when the user runs mypy.
+        result, run_mypy_with_config_file_mock = self._invoke_tighten_and_check_mypy_runs([])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("already the tightest available", result.output)
+        run_mypy_with_config_file_mock.assert_any_call("mypy.ini")
+
+        # Nothing changed, so the second time around, memoized runs are reused.
+        result, run_mypy_with_config_file_mock = self._invoke_tighten_and_check_mypy_runs([])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("already the tightest available", result.output)
+        run_mypy_with_config_file_mock.assert_not_called()
+
+    def test_tighten_with_tighter_config_available(self) -> None:
+        self._write_module_with_untyped_def()
+        result = CliRunner().invoke(init, ["--no-validate"])
+        self.assertEqual(0, result.exit_code, result.output)
+        initial_config = Path("mypy.ini").read_text()
+        self.assertIn("warn_unused_ignores = False", initial_config)
+
+        # There are no unnecessary "type: ignore" comments, so "warn_unused_ignores" can be enabled.
+        result = CliRunner().invoke(tighten, ["--error-if-can-tighten"])
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("warn_unused_ignores = True", result.output)
+        self.assertEqual(initial_config, Path("mypy.ini").read_text())
+
+        result = CliRunner().invoke(tighten, [])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("Your mypy.ini file has been updated.", result.output)
+        self.assertIn("warn_unused_ignores = True", Path("mypy.ini").read_text())
+
+        result = CliRunner().invoke(tighten, ["--error-if-can-tighten"])
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("already the tightest available", result.output)
+
+    def test_tighten_with_mypy_errors(self) -> None:
+        result = CliRunner().invoke(init, [])
+        self.assertEqual(0, result.exit_code, result.output)
+        self._write_module_with_untyped_def()
+
+        result = CliRunner().invoke(tighten, [])
+        self.assertEqual(1, result.exit_code, result.output)
+        self.assertIn("mypy found errors with the current mypy.ini config", result.output)
+        self.assertIn("c.py:1: error:", result.output)
@@ -1,7 +1,12 @@
+import io
 from unittest import TestCase
 
 from .. import __version__
-from ..config_generation import make_lax_baseline_mypy_config, make_strict_baseline_mypy_config
+from ..config_generation import (
+    make_lax_baseline_mypy_config,
+    make_strict_baseline_mypy_config,
+    write_1st_party_module_rule_blocks,
+)
 from ..own_config import TypingCopilotConfig
 
 
@@ -41,3 +46,23 @@ disallow_untyped_decorators = True
 ignore_missing_imports = False
 """
         self.assertEqual(expected_content, make_strict_baseline_mypy_config(own_config))
+
+    def test_write_1st_party_module_rule_blocks(self) -> None:
+        buffer = io.StringIO()
+        write_1st_party_module_rule_blocks(
+            buffer,
+            [
+                ("foo", [("check_untyped_defs", False), ("disallow_untyped_defs", False)]),
+                ("foo_bar.baz", [("disallow_untyped_calls", False)]),
+            ],
+        )
+
+        expected_content = """
+[mypy-foo.*]
+check_untyped_defs = False
+disallow_untyped_defs = False
+
+[mypy-foo_bar.baz.*]
+disallow_untyped_calls = False
+"""
+        self.assertEqual(expected_content, buffer.getvalue())
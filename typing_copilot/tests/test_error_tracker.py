@@ -0,0 +1,93 @@
+import re
+import sys
+from unittest import TestCase
+from unittest.mock import patch
+
+from ..error_tracker import (
+    all_errors_have_known_settings,
+    _collapse_modules,
+    _find_minimum_covering_modules,
+    _get_child_module_names_for_module,
+    _get_import_error_pattern_engine,
+)
+from ..mypy_runner import MypyError
+from .test_module_cache import use_temporary_cache_dir
+
+
+class ErrorTrackerTests(TestCase):
+    def setUp(self) -> None:
+        # Finding child modules saves them in the cache, which must not be left behind.
+        use_temporary_cache_dir(self)
+
+    def test_find_minimum_covering_modules(self) -> None:
+        module_names = {
+            "foo.bar.baz",
+            "foo.bar",
+            "foo_bar",
+            "foo.barbaz",
+            "foo0",
+            "qux.quux.corge",
+            "qux.quux.grault",
+        }
+
+        expected_modules = frozenset(
+            {"foo.bar", "foo.barbaz", "foo0", "foo_bar", "qux.quux.corge", "qux.quux.grault"}
+        )
+        self.assertEqual(expected_modules, _find_minimum_covering_modules(module_names))
+
+    def test_find_minimum_covering_modules_with_top_level_module(self) -> None:
+        module_names = {"foo", "foo.bar", "foo.bar.baz", "foobar"}
+
+        expected_modules = frozenset({"foo", "foobar"})
+        self.assertEqual(expected_modules, _find_minimum_covering_modules(module_names))
+
+    def test_collapse_modules(self) -> None:
+        test_module_names = _get_child_module_names_for_module("typing_copilot.tests")
+        self.assertIn(__name__, test_module_names)
+
+        self.assertEqual(
+            frozenset({"typing_copilot.tests", "typing_copilot.cli"}),
+            _collapse_modules(test_module_names | {"typing_copilot.cli"}),
+        )
+
+        # Modules covered by an ancestor module are dropped before replacing child modules.
+        self.assertEqual(
+            frozenset({"typing_copilot.tests", "typing_copilot.cli"}),
+            _collapse_modules(
+                test_module_names
+                | {"typing_copilot.cli", "typing_copilot.cli.foo", f"{__name__}.foo"}
+            ),
+        )
+
+        # If even one child module is missing, the parent module cannot replace the others.
+        partial_module_names = test_module_names - {__name__}
+        self.assertEqual(partial_module_names, _collapse_modules(partial_module_names))
+
+    def test_import_error_pattern_engine_falls_back_to_re(self) -> None:
+        # A None entry in sys.modules makes "import re2" raise ImportError.
+        with patch.dict(sys.modules, {"re2": None}):
+            self.assertIs(re, _get_import_error_pattern_engine())
+
+    def test_all_errors_have_known_settings(self) -> None:
+        known_setting_errors = [
+            MypyError(
+                "foo.py", 1, "no-untyped-def", "error: Function is missing a type annotation"
+            ),
+            MypyError("foo.py", 2, "misc", "error: Untyped decorator makes function untyped"),
+            MypyError(
+                "foo.py",
+                3,
+                "import",
+                'error: Skipping analyzing "bar": found module but '
+                "no type hints or library stubs",
+            ),
+        ]
+        self.assertTrue(all_errors_have_known_settings(known_setting_errors))
+
+        for heuristic_setting_error in (
+            MypyError("foo.py", 4, "operator", 'error: Unsupported operand types for + ("None")'),
+            MypyError("foo.py", 5, "misc", "error: Some other error"),
+        ):
+            self.assertFalse(
+                all_errors_have_known_settings(known_setting_errors + [heuristic_setting_error])
+            )
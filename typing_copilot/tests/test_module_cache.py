@@ -0,0 +1,106 @@
+import json
+import os
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from .. import module_cache
+from ..error_tracker import _get_child_module_names_for_module
+from ..module_cache import (
+    get_package_fingerprint,
+    load_child_module_names,
+    save_child_module_names,
+    write_child_modules_caches,
+)
+from ..mypy_runner import get_cache_dir, set_cache_dir
+
+
+def use_temporary_cache_dir(test_case: TestCase) -> str:
+    """Make the test case use an empty cache directory, and forget all cached child modules."""
+    cache_dir = TemporaryDirectory()
+    test_case.addCleanup(cache_dir.cleanup)
+
+    test_case.addCleanup(set_cache_dir, get_cache_dir())
+    set_cache_dir(cache_dir.name)
+
+    for clear_cache in (
+        module_cache._child_modules_caches.clear,
+        module_cache._unwritten_child_modules_cache_paths.clear,
+        _get_child_module_names_for_module.cache_clear,
+    ):
+        clear_cache()
+        test_case.addCleanup(clear_cache)
+
+    return cache_dir.name
+
+
+class ModuleCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = use_temporary_cache_dir(self)
+        self.cache_path = path.join(self.cache_dir, "child_modules.json")
+
+    def _forget_loaded_caches(self) -> None:
+        # As if in a new run, so the cache must be loaded from disk again.
+        module_cache._child_modules_caches.clear()
+
+    def test_cache_hit(self) -> None:
+        child_module_names = frozenset({"foo.bar", "foo.baz"})
+        save_child_module_names("foo", "fingerprint", child_module_names)
+        self.assertEqual(child_module_names, load_child_module_names("foo", "fingerprint"))
+
+        write_child_modules_caches()
+        self._forget_loaded_caches()
+        self.assertEqual(child_module_names, load_child_module_names("foo", "fingerprint"))
+
+    def test_cache_miss(self) -> None:
+        save_child_module_names("foo", "fingerprint", frozenset({"foo.bar"}))
+        write_child_modules_caches()
+        self._forget_loaded_caches()
+
+        self.assertIsNone(load_child_module_names("foo", "other fingerprint"))
+        self.assertIsNone(load_child_module_names("bar", "fingerprint"))
+
+    def test_corrupt_cache_file(self) -> None:
+        with open(self.cache_path, "w") as f:
+            f.write('{"foo": {"fingerprint": "fingerprint", "child_module_n')
+
+        self.assertIsNone(load_child_module_names("foo", "fingerprint"))
+
+        # Saving child modules replaces the corrupt file with a valid one.
+        save_child_module_names("foo", "fingerprint", frozenset({"foo.bar"}))
+        write_child_modules_caches()
+        with open(self.cache_path, "r") as f:
+            self.assertEqual(
+                {"foo": {"fingerprint": "fingerprint", "child_module_names": ["foo.bar"]}},
+                json.load(f),
+            )
+
+    def test_cache_is_only_written_once_saved_and_only_to_its_own_directory(self) -> None:
+        save_child_module_names("foo", "fingerprint", frozenset({"foo.bar"}))
+        self.assertFalse(path.exists(self.cache_path))
+
+        with TemporaryDirectory() as other_cache_dir:
+            set_cache_dir(other_cache_dir)
+            self.assertIsNone(load_child_module_names("foo", "fingerprint"))
+            save_child_module_names("bar", "fingerprint", frozenset({"bar.baz"}))
+            write_child_modules_caches()
+
+            with open(path.join(other_cache_dir, "child_modules.json"), "r") as f:
+                self.assertEqual({"bar"}, set(json.load(f)))
+
+        with open(self.cache_path, "r") as f:
+            self.assertEqual({"foo"}, set(json.load(f)))
+
+    def test_package_fingerprint(self) -> None:
+        with TemporaryDirectory() as package_path:
+            os.makedirs(path.join(package_path, "sub", "__pycache__"))
+            fingerprint = get_package_fingerprint([package_path])
+            self.assertEqual(fingerprint, get_package_fingerprint([package_path]))
+            self.assertIn(path.join(package_path, "sub"), fingerprint)
+            self.assertNotIn("__pycache__", fingerprint)
+
+            # Adding or removing a module changes the mtime of its directory.
+            sub_path = path.join(package_path, "sub")
+            sub_stat = os.stat(sub_path)
+            os.utime(sub_path, ns=(sub_stat.st_atime_ns, sub_stat.st_mtime_ns + 1))
+            self.assertNotEqual(fingerprint, get_package_fingerprint([package_path]))
@@ -0,0 +1,376 @@
+import os
+from os import path
+import sys
+from subprocess import CompletedProcess
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from .. import mypy_runner
+from ..mypy_runner import (
+    BackgroundMypyRun,
+    MypyError,
+    _get_environment_fingerprint,
+    _get_memoized_mypy_runs_dir,
+    _get_memoized_run_path,
+    _get_editable_install_roots,
+    _get_source_tree_fingerprint,
+    _load_memoized_run_for_config,
+    _load_memoized_mypy_run,
+    _memoize_run_if_completed,
+    any_mypy_errors,
+    get_cache_dir,
+    get_mypy_errors_from_completed_process,
+    set_cache_dir,
+    set_reuse_previous_runs,
+)
+
+
+class MypyRunnerTests(TestCase):
+    def test_get_mypy_errors_from_completed_process(self) -> None:
+        stdout = """\
+foo/bar.py:1: error: Function is missing a type annotation  [no-untyped-def]
+foo/bar.py:6: error: Call to untyped function "f" in typed context  [no-untyped-call]
+foo/bar.py:6: note: See https://mypy.readthedocs.io/
+foo/__init__.py:15: error: unused 'type: ignore' comment
+foo/baz.py:2: error: Argument 1 has incompatible type "List[int]"; expected "int"  [arg-type]
+Found 4 errors in 3 files (checked 3 source files)
+"""
+        completed_process: CompletedProcess = CompletedProcess([], 1, stdout, "")
+
+        expected_errors = [
+            MypyError(
+                "foo/bar.py", 1, "no-untyped-def", "error: Function is missing a type annotation"
+            ),
+            MypyError(
+                "foo/bar.py",
+                6,
+                "no-untyped-call",
+                'error: Call to untyped function "f" in typed context',
+            ),
+            MypyError("foo/__init__.py", 15, "", "error: unused 'type: ignore' comment"),
+            MypyError(
+                "foo/baz.py",
+                2,
+                "arg-type",
+                'error: Argument 1 has incompatible type "List[int]"; expected "int"',
+            ),
+        ]
+        self.assertEqual(expected_errors, get_mypy_errors_from_completed_process(completed_process))
+
+    def test_get_mypy_errors_from_completed_process_with_crlf_line_endings(self) -> None:
+        stdout = (
+            "foo/bar.py:1: error: Untyped decorator makes function untyped  [misc]\r\n"
+            "foo/bar.py:3: error: unused 'type: ignore' comment\r\n"
+            "Found 2 errors in 1 file (checked 1 source file)\r\n"
+        )
+        completed_process: CompletedProcess = CompletedProcess([], 1, stdout, "")
+
+        expected_errors = [
+            MypyError("foo/bar.py", 1, "misc", "error: Untyped decorator makes function untyped"),
+            MypyError("foo/bar.py", 3, "", "error: unused 'type: ignore' comment"),
+        ]
+        self.assertEqual(expected_errors, get_mypy_errors_from_completed_process(completed_process))
+
+    def test_get_mypy_errors_from_completed_process_with_unrecognized_line(self) -> None:
+        stdout = (
+            "foo/bar.py:1: error: Untyped decorator makes function untyped  [misc]\n"
+            "foo/bar.py: error: Something unexpected\n"
+            "Found 2 errors in 1 file (checked 1 source file)\n"
+        )
+        with self.assertRaisesRegex(AssertionError, "Unrecognized mypy output line"):
+            get_mypy_errors_from_completed_process(CompletedProcess([], 1, stdout, ""))
+
+        # Even if every line is recognized, the number of errors must match mypy's summary.
+        stdout = "Found 1 error in 1 file (checked 1 source file)\n"
+        with self.assertRaisesRegex(AssertionError, "but mypy reported 1"):
+            get_mypy_errors_from_completed_process(CompletedProcess([], 1, stdout, ""))
+
+    def test_get_mypy_errors_from_successful_completed_process(self) -> None:
+        stdout = "Success: no issues found in 3 source files\n"
+        completed_process: CompletedProcess = CompletedProcess([], 0, stdout, "")
+
+        self.assertEqual([], get_mypy_errors_from_completed_process(completed_process))
+
+    def test_any_mypy_errors(self) -> None:
+        self.assertFalse(
+            any_mypy_errors(
+                CompletedProcess([], 0, "Success: no issues found in 1 source file", "")
+            )
+        )
+        self.assertTrue(
+            any_mypy_errors(
+                CompletedProcess([], 1, "foo.py:1: error: Oops\nFound 1 error in 1 file", "")
+            )
+        )
+        with self.assertRaises(AssertionError):
+            any_mypy_errors(CompletedProcess([], 2, "", "INTERNAL ERROR"))
+
+    def test_mypy_error_from_mypy_output_line(self) -> None:
+        self.assertEqual(
+            MypyError("foo.py", 3, "misc", "error: Untyped decorator makes function untyped"),
+            MypyError.from_mypy_output_line(
+                "foo.py:3: error: Untyped decorator makes function untyped  [misc]"
+            ),
+        )
+        self.assertIsNone(MypyError.from_mypy_output_line("foo.py:3: note: See the docs"))
+
+
+def use_temporary_project_dir(test_case: TestCase) -> None:
+    """Run the test case in a project directory with a single module, with its own cache."""
+    project_dir = TemporaryDirectory()
+    test_case.addCleanup(project_dir.cleanup)
+    test_case.addCleanup(os.chdir, os.getcwd())
+    os.chdir(project_dir.name)
+
+    test_case.addCleanup(set_cache_dir, get_cache_dir())
+    set_cache_dir(".typing_copilot_cache")
+
+    for clear_cache in (
+        _get_environment_fingerprint.cache_clear,
+        _get_source_tree_fingerprint.cache_clear,
+        mypy_runner._memoized_run_paths_saved_by_this_process.clear,
+    ):
+        clear_cache()
+        test_case.addCleanup(clear_cache)
+
+    os.makedirs("pkg")
+    with open(path.join("pkg", "a.py"), "w") as f:
+        f.write("x = 1\n")
+
+
+class MypyRunCacheTests(TestCase):
+    def setUp(self) -> None:
+        use_temporary_project_dir(self)
+
+    def test_fingerprint_skips_directories_mypy_does_not_check(self) -> None:
+        for dir_path in (
+            path.join("venv", "lib", "site-packages", "q"),
+            path.join("node_modules", "z"),
+            path.join("pkg", "__pycache__"),
+            ".git",
+            ".typing_copilot_cache",
+        ):
+            os.makedirs(dir_path)
+            with open(path.join(dir_path, "a.py"), "w") as f:
+                f.write("y = 2\n")
+
+        fingerprinted_file_paths = {
+            line.split(":", 1)[0]
+            for line in _get_environment_fingerprint().splitlines()
+            if line.startswith("." + os.sep)
+        }
+        self.assertEqual({path.join(".", "pkg", "a.py")}, fingerprinted_file_paths)
+
+    def test_fingerprint_with_broken_symlink(self) -> None:
+        os.symlink("does_not_exist.toml", path.join("pkg", "broken.toml"))
+
+        self.assertIn(
+            path.join(".", "pkg", "broken.toml") + ":unreadable", _get_environment_fingerprint()
+        )
+
+    def _get_memoized_run_path_for_fresh_fingerprint(self, mypy_config: str) -> str:
+        _get_environment_fingerprint.cache_clear()
+        _get_source_tree_fingerprint.cache_clear()
+        return _get_memoized_run_path(mypy_config)
+
+    def test_memoized_run_path_changes_with_config_and_source_files(self) -> None:
+        source_path = path.join("pkg", "a.py")
+        memoized_run_path = self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        self.assertEqual(
+            memoized_run_path, self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        )
+
+        # A different config.
+        self.assertNotEqual(
+            memoized_run_path,
+            self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\nstrict = True\n"),
+        )
+
+        # A source file with a different mtime.
+        source_stat = os.stat(source_path)
+        os.utime(source_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns + 1))
+        mtime_changed_run_path = self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        self.assertNotEqual(memoized_run_path, mtime_changed_run_path)
+
+        # A source file with a different size, but the same mtime.
+        source_stat = os.stat(source_path)
+        with open(source_path, "w") as f:
+            f.write("x = 12\n")
+        os.utime(source_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        size_changed_run_path = self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        self.assertNotIn(size_changed_run_path, {memoized_run_path, mtime_changed_run_path})
+
+        # A new source file.
+        with open(path.join("pkg", "b.py"), "w") as f:
+            f.write("y = 2\n")
+        self.assertNotIn(
+            self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n"),
+            {memoized_run_path, mtime_changed_run_path, size_changed_run_path},
+        )
+
+    def test_memoize_run_if_completed(self) -> None:
+        memoized_run_path = _get_memoized_run_path("[mypy]\n")
+        self.assertIsNone(_load_memoized_mypy_run(memoized_run_path))
+
+        # mypy crashed, so a later run might not: the run must not be memoized.
+        _memoize_run_if_completed(
+            memoized_run_path, CompletedProcess(["mypy"], 2, "", "INTERNAL ERROR")
+        )
+        self.assertIsNone(_load_memoized_mypy_run(memoized_run_path))
+
+        completed_process: CompletedProcess = CompletedProcess(
+            ["mypy"], 1, "foo.py:1: error: Oops\nFound 1 error in 1 file\n", ""
+        )
+        _memoize_run_if_completed(memoized_run_path, completed_process)
+        memoized_completed_process = _load_memoized_mypy_run(memoized_run_path)
+        self.assertIsNotNone(memoized_completed_process)
+        assert memoized_completed_process is not None  # for mypy
+        self.assertEqual(
+            (
+                completed_process.args,
+                completed_process.returncode,
+                completed_process.stdout,
+                completed_process.stderr,
+            ),
+            (
+                memoized_completed_process.args,
+                memoized_completed_process.returncode,
+                memoized_completed_process.stdout,
+                memoized_completed_process.stderr,
+            ),
+        )
+
+    def test_memoized_runs_are_pruned(self) -> None:
+        completed_process: CompletedProcess = CompletedProcess(["mypy"], 0, "Success", "")
+        memoized_run_paths = [_get_memoized_run_path(f"[mypy]\n# {index}\n") for index in range(20)]
+        for index, memoized_run_path in enumerate(memoized_run_paths[:16]):
+            _memoize_run_if_completed(memoized_run_path, completed_process)
+            # Give each run a distinct mtime in the past, oldest first.
+            os.utime(memoized_run_path, ns=(index, index))
+
+        # Reusing a memoized run marks it as recently used, so the next-oldest ones are pruned.
+        self.assertIsNotNone(_load_memoized_mypy_run(memoized_run_paths[0]))
+        for memoized_run_path in memoized_run_paths[16:]:
+            _memoize_run_if_completed(memoized_run_path, completed_process)
+
+        expected_memoized_run_paths = {memoized_run_paths[0]} | set(memoized_run_paths[5:])
+        self.assertEqual(
+            expected_memoized_run_paths,
+            {
+                path.join(_get_memoized_mypy_runs_dir(), file_name)
+                for file_name in os.listdir(_get_memoized_mypy_runs_dir())
+            },
+        )
+
+    def _make_external_source_dir(self) -> str:
+        external_dir = TemporaryDirectory()
+        self.addCleanup(external_dir.cleanup)
+        os.makedirs(path.join(external_dir.name, "extpkg"))
+        with open(path.join(external_dir.name, "extpkg", "core.py"), "w") as f:
+            f.write("def f(x: int) -> int: ...\n")
+        return external_dir.name
+
+    def _change_external_source_file(self, external_dir: str) -> None:
+        with open(path.join(external_dir, "extpkg", "core.py"), "w") as f:
+            f.write("def f(x: str) -> str: ...\n")
+
+    def _assert_memoized_run_path_changes_with_external_source_file(
+        self, external_dir: str
+    ) -> None:
+        memoized_run_path = self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        self._change_external_source_file(external_dir)
+        self.assertNotEqual(
+            memoized_run_path, self._get_memoized_run_path_for_fresh_fingerprint("[mypy]\n")
+        )
+
+    def test_memoized_run_path_changes_with_import_path_source_files(self) -> None:
+        external_dir = self._make_external_source_dir()
+        with patch.object(sys, "path", sys.path + [external_dir]):
+            self._assert_memoized_run_path_changes_with_external_source_file(external_dir)
+
+    def test_memoized_run_path_changes_with_mypypath_source_files(self) -> None:
+        external_dir = self._make_external_source_dir()
+        with patch.dict(os.environ, {"MYPYPATH": external_dir}):
+            self._assert_memoized_run_path_changes_with_external_source_file(external_dir)
+
+    def test_memoized_run_path_changes_with_mypy_path_source_files(self) -> None:
+        external_dir = self._make_external_source_dir()
+        mypy_config = f"[mypy]\nmypy_path = {external_dir}\n"
+
+        memoized_run_path = self._get_memoized_run_path_for_fresh_fingerprint(mypy_config)
+        self._change_external_source_file(external_dir)
+        self.assertNotEqual(
+            memoized_run_path, self._get_memoized_run_path_for_fresh_fingerprint(mypy_config)
+        )
+
+    def test_get_editable_install_roots(self) -> None:
+        installed_packages_dir = path.join("venv", "lib", "site-packages")
+        os.makedirs(installed_packages_dir)
+        with open(path.join(installed_packages_dir, "__editable___foo_1_0_finder.py"), "w") as f:
+            f.write(
+                "import sys\n"
+                "MAPPING: dict[str, str] = {'foo': '/src/foo/foo', 'bar': '/src/foo/bar.py'}\n"
+            )
+        with open(path.join(installed_packages_dir, "__editable__.foo-1.0.pth"), "w") as f:
+            f.write("import __editable___foo_1_0_finder; __editable___foo_1_0_finder.install()\n")
+
+        self.assertEqual(
+            ["/src/foo/foo", "/src/foo/bar.py"], _get_editable_install_roots(installed_packages_dir)
+        )
+
+    def test_reuse_previous_runs_disabled(self) -> None:
+        self.addCleanup(set_reuse_previous_runs, True)
+        set_reuse_previous_runs(False)
+
+        completed_process: CompletedProcess = CompletedProcess(["mypy"], 0, "Success", "")
+        memoized_run_path = _get_memoized_run_path("[mypy]\n")
+        _memoize_run_if_completed(memoized_run_path, completed_process)
+        self.assertIsNotNone(_load_memoized_run_for_config("[mypy]\n")[1])
+
+        # Runs memoized by other processes are not reused.
+        mypy_runner._memoized_run_paths_saved_by_this_process.clear()
+        self.assertIsNone(_load_memoized_run_for_config("[mypy]\n")[1])
+
+
+class BackgroundMypyRunTests(TestCase):
+    def setUp(self) -> None:
+        use_temporary_project_dir(self)
+        with open(path.join("pkg", "b.py"), "w") as f:
+            f.write('y: int = "y"\n')
+
+    def test_result(self) -> None:
+        background_run = BackgroundMypyRun("[mypy]\n")
+        completed_process = background_run.result()
+        self.assertEqual(1, completed_process.returncode)
+        self.assertEqual(
+            [(path.join("pkg", "b.py"), 1, "assignment")],
+            [
+                (error.file_path, error.line_number, error.error_code)
+                for error in get_mypy_errors_from_completed_process(completed_process)
+            ],
+        )
+
+        # Waiting for the result again, or cancelling the completed run, changes nothing.
+        self.assertIs(completed_process, background_run.result())
+        background_run.cancel()
+        self.assertIs(completed_process, background_run.result())
+
+        # The result was memoized, so an identical run reuses it without starting mypy.
+        with patch("subprocess.Popen", side_effect=AssertionError("mypy should not run")):
+            memoized_background_run = BackgroundMypyRun("[mypy]\n")
+            memoized_completed_process = memoized_background_run.result()
+            memoized_background_run.cancel()
+
+        self.assertEqual(completed_process.stdout, memoized_completed_process.stdout)
+        self.assertEqual(completed_process.returncode, memoized_completed_process.returncode)
+
+    def test_cancel(self) -> None:
+        background_run = BackgroundMypyRun("[mypy]\n")
+        background_run.cancel()
+
+        # The mypy process was stopped, and its output was neither used nor memoized.
+        self.assertIsNotNone(background_run._process)
+        assert background_run._process is not None  # for mypy
+        self.assertIsNotNone(background_run._process.poll())
+        self.assertIsNone(_load_memoized_mypy_run(_get_memoized_run_path("[mypy]\n")))
@@ -1,11 +1,16 @@
 from pathlib import Path
+import sys
 from unittest import TestCase
 
-import toml
-
 from ..own_config import TypingCopilotConfig, find_pyproject_toml
 
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
 class ConfigTests(TestCase):
     def test_can_find_pyproject_toml(self) -> None:
         search_path = Path(__file__).parent
@@ -19,10 +24,19 @@ class ConfigTests(TestCase):
 warn_unused_ignores = true
 plugins = ["mypy_django_plugin.main"]
 """
-        config = TypingCopilotConfig.from_toml(toml.loads(toml_content))
+        config = TypingCopilotConfig.from_toml(tomllib.loads(toml_content))
 
         expected_config = {
             "warn_unused_ignores": True,
             "plugins": ["mypy_django_plugin.main"],
         }
         self.assertEqual(expected_config, config.mypy_global_config)
+
+    def test_configs_with_unhashable_values_are_hashable(self) -> None:
+        config = TypingCopilotConfig(mypy_global_config={"plugins": ["mypy_django_plugin.main"]})
+        equal_config = TypingCopilotConfig(
+            mypy_global_config={"plugins": ["mypy_django_plugin.main"]}
+        )
+
+        self.assertEqual(config, equal_config)
+        self.assertEqual(hash(config), hash(equal_config))
@@ -1,17 +1,21 @@
-import string
+from functools import lru_cache
+import re
 
 
-def validate_module_name(module_name: str) -> None:
-    expected_chars = frozenset(string.ascii_letters + string.digits + "_" + ".")
-    actual_chars = frozenset(module_name)
+# Matches any character that is not valid in a module name. Searching with a precompiled pattern
+# stops at the first invalid character, and does not build any intermediate strings or sets.
+_invalid_module_name_char_pattern = re.compile(r"[^A-Za-z0-9_.]")
 
-    expected_chars = frozenset(string.ascii_letters + string.digits + "_" + ".")
-    actual_chars = frozenset(module_name)
 
-    unexpected_chars = actual_chars - expected_chars
-    if unexpected_chars:
+# The same module names are validated over and over, e.g. once per mypy error in the module.
+# Invalid names raise an error, and errors are never cached, so only valid names are remembered.
+@lru_cache(maxsize=4096)
+def validate_module_name(module_name: str) -> None:
+    if _invalid_module_name_char_pattern.search(module_name) is not None:
+        unexpected_chars = frozenset(_invalid_module_name_char_pattern.findall(module_name))
         raise AssertionError(
-            f"Invalid module name: found unexpected characters {unexpected_chars} in {module_name}"
+            f"Invalid module name: found unexpected characters {unexpected_chars} "
+            f"in {module_name}"
         )
 
     if module_name.startswith(".") or module_name.endswith("."):
@@ -1,19 +1,31 @@
 import click
 
 
-_verbose_mode = False
+def _log(message: str) -> None:
+    click.echo(message, err=True)
 
 
-def enable_verbose_mode() -> None:
-    global _verbose_mode
-    _verbose_mode = True
+def _do_not_log(message: str) -> None:
+    pass
 
 
-def disable_verbose_mode() -> None:
-    global _verbose_mode
-    _verbose_mode = False
+# Rebound when verbose mode is enabled or disabled, so that when not in verbose mode, logging costs
+# nothing more than a call to a no-op function. To observe the rebinding, callers must look up
+# this function on the module at call time: "verbosity.log_if_verbose(...)".
+log_if_verbose = _do_not_log
 
+# Callers can check this before building log messages that are expensive to format,
+# such as ones that include the entire mypy output, to skip that work when not in verbose mode.
+verbose_mode_enabled = False
 
-def log_if_verbose(message: str) -> None:
-    if _verbose_mode:
-        click.echo(message, err=True)
+
+def enable_verbose_mode() -> None:
+    global log_if_verbose, verbose_mode_enabled
+    log_if_verbose = _log
+    verbose_mode_enabled = True
+
+
+def disable_verbose_mode() -> None:
+    global log_if_verbose, verbose_mode_enabled
+    log_if_verbose = _do_not_log
+    verbose_mode_enabled = False